@@ -1,11 +1,15 @@
 import sys
 import time
+import heapq
 from typing import Optional, Union, Any
 import operator
+import numpy as np
 from classes.chip import Chip
 from classes.gate import Gate
+from classes.grid import Grid
 from classes.wire import Wire
-from analysis.save import save_to_file
+from analysis.save import RunLogger
+from .distance_fields import load_distance_fields
 sys.path.insert(0, "../classes")
 
 
@@ -20,9 +24,10 @@ class WireSegment:
     """
 
     def __init__(self, previous_segment: Any = None,
-                 position: Any = None) -> None:
+                 position: Any = None, cell: Optional[int] = None) -> None:
         self.previous_segment = previous_segment
         self.position = position
+        self.cell = cell
 
         self.wire_cost: int = 0
         self.manhattan_cost: int = 0
@@ -56,6 +61,72 @@ class Heuristics:
         self.heuristic = heuristic
         self.sorting_mode = sorting_mode
 
+        # Static cost per cell, filled by create_static_cost_fields
+        self.gate_cost_field: list[int] = []
+        self.layer_cost_field: list[int] = []
+        self.close_cells: dict[tuple[int, int, int], frozenset[int]] = {}
+        self.distance_fields: dict[tuple[int, int, int], list[int]] = {}
+
+    def create_static_cost_fields(self, chip: "Chip") -> None:
+        """
+        Precomputes the gate proximity and layer preference cost of every
+        cell, as the gate layout does not change during a run.
+        """
+
+        grid_x, grid_y, grid_z = chip.grid.get_grid_size()
+        shape: tuple[int, ...] = chip.grid.shape
+
+        # Mark gates, leaving out the last index of every axis, which
+        # falls outside the neighbourhood checked around a segment
+        gates = np.zeros(shape, dtype=bool)
+        for gate in chip.gates.values():
+            x, y, z = gate.get_coords()
+            if x < grid_x and y < grid_y and z < grid_z:
+                gates[z, y, x] = True
+
+        # Count the gates in the 2x2x2 neighbourhood above every cell
+        close_gates = np.zeros(shape, dtype=int)
+        for dz in range(2):
+            for dy in range(2):
+                for dx in range(2):
+                    close_gates[:shape[0] - dz, :shape[1] - dy,
+                                :shape[2] - dx] += gates[dz:, dy:, dx:]
+
+        # Lower layers cost more, the top layer is free
+        layer_costs = np.broadcast_to(
+            (grid_z - np.arange(shape[0])).reshape(-1, 1, 1), shape)
+
+        self.gate_cost_field = (50 * close_gates).reshape(-1).tolist()
+        self.layer_cost_field = layer_costs.reshape(-1).tolist()
+        self.close_cells = {}
+
+        # Distances around the gates, shared by chips with the same print
+        self.distance_fields = load_distance_fields(chip)
+
+    def get_close_cells(self, chip: "Chip",
+                        gate_coords: tuple[int, int, int]) -> frozenset[int]:
+        """
+        Returns the cells which count the gate on the given coordinates
+        as a close gate.
+        """
+
+        if gate_coords not in self.close_cells:
+            grid_x, grid_y, grid_z = chip.grid.get_grid_size()
+            cells: set[int] = set()
+
+            if (gate_coords[0] < grid_x and gate_coords[1] < grid_y
+                    and gate_coords[2] < grid_z):
+                for z in range(max(gate_coords[2] - 1, 0), gate_coords[2] + 1):
+                    for y in range(max(gate_coords[1] - 1, 0),
+                                   gate_coords[1] + 1):
+                        for x in range(max(gate_coords[0] - 1, 0),
+                                       gate_coords[0] + 1):
+                            cells.add(chip.grid.encode((x, y, z)))
+
+            self.close_cells[gate_coords] = frozenset(cells)
+
+        return self.close_cells[gate_coords]
+
     def sort_desired_connections(self, chip: "Chip") ->\
             list[tuple["Gate", "Gate", int]]:
         """
@@ -95,6 +166,22 @@ class Heuristics:
 
         return manhattan_distance
 
+    def estimate_distance(self, next_segment: "WireSegment",
+                          father_coords: tuple[int, int, int]) -> int:
+        """
+        Returns the number of steps from a segment to the father gate when
+        walking around the other gates, or the manhattan distance if the
+        father is not a gate.
+        """
+
+        distance_field: Optional[list[int]] =\
+            self.distance_fields.get(father_coords)
+        if distance_field is None:
+            return self.calculate_manhattan_distance(next_segment.position,
+                                                     father_coords)
+
+        return distance_field[next_segment.cell]
+
     def default(self, chip: "Chip", current_segment: "WireSegment",
                 next_segment: "WireSegment",
                 father_coords: tuple[int, int, int]) -> None:
@@ -103,19 +190,17 @@ class Heuristics:
         """
 
         # Check if position contains a wire segment and assign wire cost
-        if (chip.grid.values[next_segment.get_z()]
-            [next_segment.get_y()]
-                [next_segment.get_x()] <= -1):
+        if (chip.grid.get_wire_count(next_segment.cell) >= 1):
             # next_segment.wire_cost += 300
             next_segment.wire_cost = current_segment.wire_cost + 300
         else:
             # next_segment.wire_cost += 1
             next_segment.wire_cost = current_segment.wire_cost + 1
 
-        # Assign manhattan distance cost
+        # Assign distance cost, which is never less than the manhattan
+        # distance as gates can not be walked through
         manhattan_distance: int =\
-            self.calculate_manhattan_distance(next_segment.position,
-                                              father_coords)
+            self.estimate_distance(next_segment, father_coords)
         next_segment.manhattan_cost = manhattan_distance
 
         # Assign total cost
@@ -123,48 +208,43 @@ class Heuristics:
 
     def avoid_gates(self, chip: "Chip", next_segment: "WireSegment",
                     mother_coords: tuple[int, int, int],
-                    father_coords: tuple[int, int, int]) -> None:
+                    father_coords: tuple[int, int, int],
+                    excluded_gates: Optional[list[tuple[int, int, int]]] =
+                    None) -> None:
 
         """
         Assigns a segment a higher cost if it is close to a gate.
         """
-        segment_position: tuple[int, int, int] = next_segment.position
-        grid_size: tuple[int, int, int] = chip.grid.get_grid_size()
-
-        # Set avoid distance
-        avoid_distance: int = 1
-
-        # Check for close gates
-        for z in range(segment_position[2],
-                       segment_position[2] + avoid_distance + 1):
-            for y in range(segment_position[1],
-                           segment_position[1] + avoid_distance + 1):
-                for x in range(segment_position[0],
-                               segment_position[0] + avoid_distance + 1):
-                    if (x < grid_size[0]
-                        and y < grid_size[1]
-                            and z < grid_size[2]):
-                        if (chip.grid.values[z][y][x] > 0
-                            and not (x, y, z) == mother_coords
-                                and not (x, y, z) == father_coords):
-                            next_segment.wire_cost += 50
+
+        gate_cost: int = self.gate_cost_field[next_segment.cell]
+
+        # The mother and father gate of the wire, or the explicitly
+        # excluded gates, do not count
+        if (gate_cost > 0):
+            if excluded_gates is None:
+                excluded_gates = [mother_coords, father_coords]
+            for gate_coords in excluded_gates:
+                if next_segment.cell in self.get_close_cells(chip,
+                                                             gate_coords):
+                    gate_cost -= 50
+
+        next_segment.wire_cost += gate_cost
 
     def avoid_low_layers(self, next_segment: "WireSegment") -> None:
         """
         Assigns a segment a higher cost if its in a lower layer.
         """
 
-        layer_costs: list[int] = [7, 6, 5, 4, 3, 2, 1, 0]
-        z: int = next_segment.get_z()
-
-        next_segment.wire_cost += layer_costs[z]
+        next_segment.wire_cost += self.layer_cost_field[next_segment.cell]
 
     def assign_next_segment_costs(self, chip: "Chip",
                                   current_segment: "WireSegment",
                                   next_segment: "WireSegment",
                                   mother_coords: tuple[int, int, int],
-                                  father_coords: tuple[int, int, int]) ->\
-            None:
+                                  father_coords: tuple[int, int, int],
+                                  excluded_gates:
+                                  Optional[list[tuple[int, int, int]]] = None)\
+            -> None:
         """
         Determines and assigns the cost of using a wire segment to the object.
         """
@@ -172,7 +252,8 @@ class Heuristics:
         # Apply different costs based on chosen heuristic
         self.default(chip, current_segment, next_segment, father_coords)
         if (self.heuristic == "avoid_gates"):
-            self.avoid_gates(chip, next_segment, mother_coords, father_coords)
+            self.avoid_gates(chip, next_segment, mother_coords, father_coords,
+                             excluded_gates)
             next_segment.total_cost =\
                 next_segment.wire_cost + next_segment.manhattan_cost
         elif (self.heuristic == "avoid_low"):
@@ -180,7 +261,8 @@ class Heuristics:
             next_segment.total_cost =\
                 next_segment.wire_cost + next_segment.manhattan_cost
         elif (self.heuristic == "all"):
-            self.avoid_gates(chip, next_segment, mother_coords, father_coords)
+            self.avoid_gates(chip, next_segment, mother_coords, father_coords,
+                             excluded_gates)
             self.avoid_low_layers(next_segment)
             next_segment.total_cost =\
                 next_segment.wire_cost + next_segment.manhattan_cost
@@ -193,11 +275,19 @@ class AstarAlg:
         to output to.
     """
 
-    def __init__(self, chip_no: int, netlist_no: int, output_filename: str,
-                 sorting_mode: str, heuristic: str) -> None:
+    heuristics_class: type = Heuristics
+
+    def __init__(self, chip_no: int, netlist_no: int,
+                 output_filename: Optional[str],
+                 sorting_mode: str, heuristic: str,
+                 log_format: str = "csv") -> None:
         self.chip: "Chip" = Chip(chip_no, f"netlist_{netlist_no}.csv")
-        self.heuristic: "Heuristics" = Heuristics(heuristic, sorting_mode)
+        self.heuristic: "Heuristics" =\
+            self.heuristics_class(heuristic, sorting_mode)
+        self.heuristic.create_static_cost_fields(self.chip)
         self.output_filename = output_filename
+        self.log_format = log_format
+        self.nodes_expanded: int = 0
         self.run()
 
     def create_parent_segments(self, mother_coords: tuple[int, int, int],
@@ -207,8 +297,11 @@ class AstarAlg:
         Returns the origin and destination segment of a wire.
         """
 
-        mother_segment: "WireSegment" = WireSegment(None, mother_coords)
-        father_segment: "WireSegment" = WireSegment(None, father_coords)
+        grid: "Grid" = self.chip.grid
+        mother_segment: "WireSegment" =\
+            WireSegment(None, mother_coords, grid.encode(mother_coords))
+        father_segment: "WireSegment" =\
+            WireSegment(None, father_coords, grid.encode(father_coords))
 
         return mother_segment, father_segment
 
@@ -218,8 +311,7 @@ class AstarAlg:
         """
 
         for coordinate in wire_path[1:-1]:
-            self.chip.grid.values[coordinate[2]][coordinate[1]][coordinate[0]]\
-                -= 1
+            self.chip.grid.add_wire_unit(self.chip.grid.encode(coordinate))
 
     def check_if_wire_completed(self, current_segment: "WireSegment",
                                 father_segment: "WireSegment") ->\
@@ -231,13 +323,14 @@ class AstarAlg:
         """
 
         wire_path: list[tuple[int, int, int]] = []
-        if current_segment == father_segment:
+        if current_segment.cell == father_segment.cell:
             segment: "WireSegment" = current_segment
 
-            # Create path
+            # Create path, from mother to father
             while segment is not None:
                 wire_path.append(segment.position)
                 segment = segment.previous_segment
+            wire_path.reverse()
 
             # Update 3D array
             self.update_grid(wire_path)
@@ -246,87 +339,46 @@ class AstarAlg:
         else:
             return False, None
 
-    def get_all_directions(self, current_segment: "WireSegment") ->\
-            list[tuple[int, int, int]]:
-        """
-        Retuns all possible directions in the grid from a wire segments'
-        position.
-        """
-
-        x: int = current_segment.get_x()
-        y: int = current_segment.get_y()
-        z: int = current_segment.get_z()
-
-        directions = [(x + 1, y, z),
-                      (x - 1, y, z),
-                      (x, y + 1, z),
-                      (x, y - 1, z),
-                      (x, y, z + 1),
-                      (x, y, z - 1)]
-
-        return directions
-
     def get_possible_directions(self, current_segment: "WireSegment",
-                                father_coords: tuple[int, int, int]) ->\
-            list[tuple[int, int, int]]:
+                                father_cell: int) -> list[int]:
         """
-        Returns all possible directions in the grid from a wire segemnt's
-        position.
+        Returns the cells a wire can move to from a wire segment's cell.
         """
 
-        possible_directions: list[tuple[int, int, int]] = []
-
-        # Get all directions
-        directions: list[tuple[int, int, int]] =\
-            self.get_all_directions(current_segment)
+        possible_directions: list[int] = []
+        grid: "Grid" = self.chip.grid
 
-        # Iterate through all directions
-        for direction in directions:
-            # Get grid bounds
-            grid_upperbounds: tuple[int, int, int] =\
-                self.chip.grid.get_grid_size()
-
-            # Check if this direction is outside the grid, proceed if not
-            if direction[0] > grid_upperbounds[0] or\
-                direction[1] > grid_upperbounds[1] or\
-                direction[2] > grid_upperbounds[2] or\
-                direction[0] < 0 or\
-                direction[1] < 0 or\
-                    direction[2] < 0:
-                continue
-
-            # Check if this direction contains a gate other than
+        # Iterate through the in-bounds neighbours of the current cell
+        for cell in grid.neighbours[current_segment.cell]:
+            # Check if this cell contains a gate other than
             # the father gate, proceed if not
-            if self.chip.grid.values[direction[2]][direction[1]][direction[0]]\
-                    > 0 and direction != father_coords:
+            if grid.is_gate(cell) and cell != father_cell:
                 continue
 
-            # If all checks passed, append direction to possible directions
-            possible_directions.append(direction)
+            # If all checks passed, append cell to possible directions
+            possible_directions.append(cell)
 
         return possible_directions
 
     def create_next_segments(self, current_segment: "WireSegment",
-                             father_coords: tuple[int, int, int]) ->\
-            list["WireSegment"]:
+                             father_cell: int) -> list["WireSegment"]:
         """
         Create and return a wire segment for each possible direction
         from the current wire segment.
         """
 
         next_segments: list["WireSegment"] = []
+        cell_coords: list[tuple[int, int, int]] = self.chip.grid.cell_coords
 
         # Get possible directions
-        possible_directions: list[tuple[int, int, int]] =\
-            self.get_possible_directions(current_segment, father_coords)
+        possible_directions: list[int] =\
+            self.get_possible_directions(current_segment, father_cell)
 
         # Iterate through possible directions
-        for direction in possible_directions:
-            next_segment_position: tuple[int, int, int] = direction
-
+        for cell in possible_directions:
             # Create new wire segment
             new_segment: "WireSegment" =\
-                WireSegment(current_segment, next_segment_position)
+                WireSegment(current_segment, cell_coords[cell], cell)
 
             # Append new segment to list
             next_segments.append(new_segment)
@@ -339,11 +391,14 @@ class AstarAlg:
         Determines the shortest path between two points and draws the wire.
         """
 
-        # Create lists which keep track of checked
-        # and not-checked possible segments
-        open_list: list["WireSegment"] = []
-        closed_list: list["WireSegment"] = []
+        # Create a heap of not-checked segments, ordered on total cost and
+        # then on insertion order (latest first), a map of the cheapest
+        # open segment per cell and a set of checked cells
+        open_heap: list[tuple[int, int, "WireSegment"]] = []
+        open_segments: dict[int, "WireSegment"] = {}
+        closed_set: set[int] = set()
         next_segments: list["WireSegment"] = []
+        push_count: int = 0
 
         # Initialize mother and father segments
         mother_coords: tuple[int, int, int] = mother.get_coords()
@@ -351,20 +406,23 @@ class AstarAlg:
         mother_segment, father_segment =\
             self.create_parent_segments(mother_coords, father_coords)
 
-        # Initialize open list with mother segment
-        open_list.append(mother_segment)
+        # Initialize open heap with mother segment
+        heapq.heappush(open_heap, (mother_segment.total_cost, push_count,
+                                   mother_segment))
+        open_segments[mother_segment.cell] = mother_segment
 
         # Repeat while there open paths
-        while len(open_list) > 0:
-            # Sort open list on segment cost
-            open_list.sort(key=lambda x: x.total_cost, reverse=True)
-
+        while len(open_heap) > 0:
             # Set the current segment to the lowest sum segment
-            current_segment: "WireSegment" = open_list[len(open_list) - 1]
+            current_segment: "WireSegment" = heapq.heappop(open_heap)[2]
 
-            # Add current lowest value (current) segment to closed list
-            open_list.pop()
-            closed_list.append(current_segment)
+            # Skip segments which were replaced by a cheaper path (lazy
+            # deletion), else move the segment to the closed set
+            if open_segments.get(current_segment.cell) is not current_segment:
+                continue
+            del open_segments[current_segment.cell]
+            closed_set.add(current_segment.cell)
+            self.nodes_expanded += 1
 
             # Check if father is reached
             completed, wire_path =\
@@ -374,17 +432,12 @@ class AstarAlg:
 
             # Get all next possible segments
             next_segments =\
-                self.create_next_segments(current_segment, father_coords)
+                self.create_next_segments(current_segment, father_segment.cell)
 
             # Loop through next segments to see if they are valid and better
             for segment in next_segments:
-                go_next: bool = False
-
                 # Skip segment if it has already been passed
-                for closed_segment in closed_list:
-                    if segment == closed_segment:
-                        go_next = True
-                if go_next:
+                if segment.cell in closed_set:
                     continue
 
                 # Assign costs to the next segment
@@ -394,27 +447,37 @@ class AstarAlg:
                                                          mother_coords,
                                                          father_coords)
 
-                # Check if possible next segment already in open list
-                for index, open_segment in enumerate(open_list):
-                    if segment == open_segment:
-                        # Skip segment if there already is a segment on the
-                        # same position with a cheaper path, else add segment
-                        # and remove more expensive path
-                        if segment.wire_cost > open_segment.wire_cost:
-                            go_next = True
-                        else:
-                            closed_list.append(open_segment)
-                            open_list.pop(index)
-                if go_next:
-                    continue
-
-                # Add the segment to the open list
-                open_list.append(segment)
-
-        # Exit if open list is empty and father was not found
+                # Check if possible next segment already in open heap
+                open_segment: Optional["WireSegment"] =\
+                    open_segments.get(segment.cell)
+                if open_segment is not None:
+                    # Skip segment if there already is a segment on the
+                    # same cell with a cheaper path, else add segment
+                    # and close the cell of the more expensive path
+                    if segment.wire_cost > open_segment.wire_cost:
+                        continue
+                    closed_set.add(segment.cell)
+
+                # Add the segment to the open heap
+                push_count += 1
+                heapq.heappush(open_heap, (segment.total_cost, -push_count,
+                                           segment))
+                open_segments[segment.cell] = segment
+
+        # Exit if open heap is empty and father was not found
         print("Can't lay wire")
         sys.exit(1)
 
+    def create_wire(self, mother: "Gate", father: "Gate") -> "Wire":
+        """
+        Draws the shortest path between two gates and returns it as a wire.
+        """
+
+        new_wire: "Wire" = Wire(mother, father)
+        new_wire.set_path(self.draw_wire(mother, father))
+
+        return new_wire
+
     def run(self) -> None:
         """
         Lay all wires and return chip.
@@ -433,26 +496,17 @@ class AstarAlg:
             mother: "Gate" = connection[0]
             father: "Gate" = connection[1]
 
-            # Draw wire and get path
+            # Draw wire and add wire object to chip
             print(f"Drawing wire {wires_drawn}")
-            wire_path: list[tuple[int, int, int]] =\
-                self.draw_wire(mother, father)
+            self.chip.add_wire(self.create_wire(mother, father))
             wires_drawn += 1
 
-            # Create new wire object
-            new_wire: "Wire" = Wire(mother, father)
-            new_wire.pop_unit()
-
-            # Add found path to wire object
-            for segment_coords in wire_path:
-                new_wire.add_unit(segment_coords)
-
-            # Add wire object to chip
-            self.chip.add_wire(new_wire)
-
         # Determine duration of algorithm
         total_time: float = time.time() - start_time
         print(f"Runtime: {round(total_time, 2)} seconds.")
+        print(f"Expanded {self.nodes_expanded} segments"
+              f" ({round(self.nodes_expanded / max(total_time, 1e-9))}"
+              f" per second).")
 
         # Assing duration to chip
         self.chip.iteration_duration = total_time
@@ -462,4 +516,6 @@ class AstarAlg:
         self.chip.calculate_costs()
 
         # Save relevant chip data to file
-        save_to_file(self.chip, self.output_filename)
+        if self.output_filename is not None:
+            with RunLogger(self.output_filename, self.log_format) as logger:
+                logger.log(self.chip)
@@ -0,0 +1,228 @@
+import heapq
+import math
+import sys
+from typing import Optional
+from classes.gate import Gate
+from .astar import AstarAlg, WireSegment
+
+sys.path.append("../classes")
+sys.path.append("..")
+
+
+class SearchFront:
+    """ Holds one direction of a bidirectional search: the open heap, the
+        cheapest known segment per cell, the checked cells and the gate it
+        heads for.
+    """
+
+    def __init__(self, root_segment: "WireSegment",
+                 goal_coords: tuple[int, int, int], goal_cell: int) -> None:
+        self.goal_coords = goal_coords
+        self.goal_cell = goal_cell
+        self.open_heap: list[tuple[float, int, "WireSegment"]] = []
+        self.best_segments: dict[int, "WireSegment"] = {}
+        self.closed_set: set[int] = set()
+        self.push_count: int = 0
+
+        self.push(root_segment)
+
+    def push(self, segment: "WireSegment") -> None:
+        """
+        Adds a segment to the open heap, latest first on equal cost.
+        """
+
+        self.push_count += 1
+        heapq.heappush(self.open_heap, (segment.total_cost, -self.push_count,
+                                        segment))
+        self.best_segments[segment.cell] = segment
+
+    def get_lowest_cost(self) -> float:
+        """
+        Drops replaced and checked segments from the top of the open heap
+        and returns the lowest total cost left in it.
+        """
+
+        while len(self.open_heap) > 0:
+            segment: "WireSegment" = self.open_heap[0][2]
+            if segment.cell not in self.closed_set and\
+                    self.best_segments[segment.cell] is segment:
+                return self.open_heap[0][0]
+            heapq.heappop(self.open_heap)
+
+        return math.inf
+
+
+class BidirectionalAstar(AstarAlg):
+    """ Implements A* searching from the mother and the father gate at the
+        same time. The forward search pays for every cell it enters, the
+        backward search for every cell it leaves, so both add up to the
+        cost of the same path. Both directions are ordered on the average
+        of the estimates, half the distance to their own goal minus half
+        the distance to their own start, so the estimates of the two
+        directions cancel out on any path. The cheapest meeting point seen
+        so far is kept, and the search stops as soon as the cheapest open
+        segments of both directions together cost at least as much, as no
+        cheaper path is left then.
+    """
+
+    def assign_estimate(self, segment: "WireSegment", forward: bool,
+                        mother_coords: tuple[int, int, int],
+                        father_coords: tuple[int, int, int]) -> None:
+        """
+        Assigns the averaged estimate and total cost of a segment.
+        """
+
+        to_father: int =\
+            self.heuristic.estimate_distance(segment, father_coords)
+        to_mother: int =\
+            self.heuristic.estimate_distance(segment, mother_coords)
+
+        segment.manhattan_cost = (to_father - to_mother) / 2 if forward\
+            else (to_mother - to_father) / 2
+        segment.total_cost = segment.wire_cost + segment.manhattan_cost
+
+    def get_entry_cost(self, cell: int, mother_coords: tuple[int, int, int],
+                       father_coords: tuple[int, int, int]) -> int:
+        """
+        Returns the cost of entering a cell, heuristics included.
+        """
+
+        start_segment: "WireSegment" = WireSegment()
+        segment: "WireSegment" =\
+            WireSegment(start_segment, self.chip.grid.cell_coords[cell], cell)
+        self.heuristic.assign_next_segment_costs(
+            self.chip, start_segment, segment, mother_coords, father_coords,
+            [mother_coords, father_coords])
+
+        return segment.wire_cost
+
+    def expand(self, front: "SearchFront", other_front: "SearchFront",
+               current_segment: "WireSegment", forward: bool,
+               mother_coords: tuple[int, int, int],
+               father_coords: tuple[int, int, int],
+               best_meeting: list) -> None:
+        """
+        Adds the segments around a checked segment to the open heap of its
+        direction and records the cheapest meeting with the other one.
+        """
+
+        grid = self.chip.grid
+        excluded_gates: list[tuple[int, int, int]] =\
+            [mother_coords, father_coords]
+
+        # Going backward, the cell which is left is paid for
+        if not forward:
+            leaving_cost: int =\
+                self.get_entry_cost(current_segment.cell, mother_coords,
+                                    father_coords)
+
+        for cell in grid.neighbours[current_segment.cell]:
+            # Skip gates other than the goal, and checked cells
+            if (grid.is_gate(cell) and cell != front.goal_cell) or\
+                    cell in front.closed_set:
+                continue
+
+            # Assign costs to the next segment
+            segment: "WireSegment" =\
+                WireSegment(current_segment, grid.cell_coords[cell], cell)
+            if forward:
+                self.heuristic.assign_next_segment_costs(
+                    self.chip, current_segment, segment, mother_coords,
+                    father_coords, excluded_gates)
+            else:
+                segment.wire_cost = current_segment.wire_cost + leaving_cost
+            self.assign_estimate(segment, forward, mother_coords,
+                                 father_coords)
+
+            # Skip segment if there already is a cheaper path to its cell
+            best_segment: Optional["WireSegment"] =\
+                front.best_segments.get(cell)
+            if best_segment is not None and\
+                    best_segment.wire_cost <= segment.wire_cost:
+                continue
+            front.push(segment)
+
+            # Remember the cheapest path through both directions
+            other_segment: Optional["WireSegment"] =\
+                other_front.best_segments.get(cell)
+            if other_segment is not None and\
+                    segment.wire_cost + other_segment.wire_cost <\
+                    best_meeting[0]:
+                best_meeting[:] =\
+                    [segment.wire_cost + other_segment.wire_cost,
+                     segment, other_segment] if forward else\
+                    [segment.wire_cost + other_segment.wire_cost,
+                     other_segment, segment]
+
+    def draw_wire(self, mother: "Gate", father: "Gate") ->\
+            list[tuple[int, int, int]]:
+        """
+        Determines the cheapest path between two gates, searching from both
+        ends, and draws the wire.
+        """
+
+        mother_coords: tuple[int, int, int] = mother.get_coords()
+        father_coords: tuple[int, int, int] = father.get_coords()
+        mother_segment, father_segment =\
+            self.create_parent_segments(mother_coords, father_coords)
+
+        self.assign_estimate(mother_segment, True, mother_coords,
+                             father_coords)
+        self.assign_estimate(father_segment, False, mother_coords,
+                             father_coords)
+        forward_front = SearchFront(mother_segment, father_coords,
+                                    father_segment.cell)
+        backward_front = SearchFront(father_segment, mother_coords,
+                                     mother_segment.cell)
+
+        # Cost of the cheapest path found, its forward and backward segment
+        best_meeting: list = [math.inf, None, None]
+
+        while True:
+            forward_cost: float = forward_front.get_lowest_cost()
+            backward_cost: float = backward_front.get_lowest_cost()
+
+            # No cheaper path is left once both directions cost as much
+            if forward_cost + backward_cost >= best_meeting[0]:
+                break
+
+            # Continue the direction with the fewest open segments
+            forward: bool = len(forward_front.open_heap) <=\
+                len(backward_front.open_heap)
+            front, other_front = (forward_front, backward_front) if forward\
+                else (backward_front, forward_front)
+
+            current_segment: "WireSegment" =\
+                heapq.heappop(front.open_heap)[2]
+            front.closed_set.add(current_segment.cell)
+            self.nodes_expanded += 1
+
+            # The goal gate is an end point, it is never passed through
+            if current_segment.cell == front.goal_cell:
+                continue
+
+            self.expand(front, other_front, current_segment, forward,
+                        mother_coords, father_coords, best_meeting)
+
+        # Exit if both directions never met
+        if best_meeting[0] == math.inf:
+            print("Can't lay wire")
+            sys.exit(1)
+
+        # Create path, from mother to the meeting cell and on to father
+        wire_path: list[tuple[int, int, int]] = []
+        segment: Optional["WireSegment"] = best_meeting[1]
+        while segment is not None:
+            wire_path.append(segment.position)
+            segment = segment.previous_segment
+        wire_path.reverse()
+
+        segment = best_meeting[2].previous_segment
+        while segment is not None:
+            wire_path.append(segment.position)
+            segment = segment.previous_segment
+
+        # Update 3D array
+        self.update_grid(wire_path)
+
+        return wire_path
@@ -0,0 +1,98 @@
+import math
+import signal
+import threading
+import time
+from typing import Any, Optional
+
+
+class Budget:
+    """ Implements the stopping criteria of an anytime run: a wall-clock
+        time limit in seconds, a number of iterations, a number of
+        iterations without a better cost and a target cost. Criteria which
+        are None are not checked, without any criteria the run stops on
+        'ctrl+C'. Use as a context manager around the run, 'ctrl+C' then
+        only marks the budget as spent, so the run stops between two
+        iterations and never in the middle of one.
+    """
+
+    def __init__(self, time_limit: Optional[float] = None,
+                 iterations: Optional[int] = None,
+                 no_improvement: Optional[int] = None,
+                 target_cost: Optional[int] = None) -> None:
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.no_improvement = no_improvement
+        self.target_cost = target_cost
+
+        self.iteration: int = 0
+        self.best_cost: float = math.inf
+        self.last_improvement: int = 0
+        self.deadline: float = math.inf
+        self.interrupted: bool = False
+        self.stop_reason: Optional[str] = None
+        self.previous_handler: Any = None
+
+    def __enter__(self) -> "Budget":
+        self.start()
+
+        # Signal handlers can only be set from the main thread
+        if threading.current_thread() is threading.main_thread():
+            self.previous_handler = signal.signal(signal.SIGINT,
+                                                  self.interrupt)
+
+        return self
+
+    def __exit__(self, *exception: Any) -> None:
+        if self.previous_handler is not None:
+            signal.signal(signal.SIGINT, self.previous_handler)
+            self.previous_handler = None
+
+    def start(self) -> None:
+        """
+        Starts the clock and the counters.
+        """
+
+        self.iteration = 0
+        self.best_cost = math.inf
+        self.last_improvement = 0
+        self.interrupted = False
+        self.stop_reason = None
+        self.deadline = math.inf if self.time_limit is None\
+            else time.monotonic() + self.time_limit
+
+    def interrupt(self, *args: Any) -> None:
+        """
+        Marks the budget as spent, used as handler for 'ctrl+C'.
+        """
+
+        self.interrupted = True
+
+    def is_spent(self, cost: float) -> bool:
+        """
+        Records the current cost of the run, called before every iteration,
+        and returns True if the run should stop.
+        """
+
+        if cost < self.best_cost:
+            self.best_cost = cost
+            self.last_improvement = self.iteration
+
+        if self.interrupted:
+            self.stop_reason = "interrupted"
+        elif self.target_cost is not None and cost <= self.target_cost:
+            self.stop_reason = f"target cost {self.target_cost} reached"
+        elif self.iterations is not None and\
+                self.iteration >= self.iterations:
+            self.stop_reason = f"{self.iterations} iterations done"
+        elif self.no_improvement is not None and\
+                self.iteration - self.last_improvement >= self.no_improvement:
+            self.stop_reason = f"no improvement in {self.no_improvement}"\
+                               " iterations"
+        elif time.monotonic() >= self.deadline:
+            self.stop_reason = f"time limit of {self.time_limit} seconds"\
+                               " reached"
+        else:
+            self.iteration += 1
+            return False
+
+        return True
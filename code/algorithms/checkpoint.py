@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+import numpy as np
+
+# Seconds between two checkpoints of a run
+CHECKPOINT_INTERVAL: float = 60.0
+
+# Layout version of a checkpoint file
+CHECKPOINT_VERSION: int = 1
+
+
+def get_checkpoint_path(output_filename: str) -> str:
+    """
+    Returns the path of the checkpoint file of a run.
+    """
+
+    return f"../output/{output_filename}/{output_filename}.checkpoint.npz"
+
+
+def encode_paths(paths: list[list[tuple[int, int, int]]]) ->\
+        tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the length of every path and the coordinates of all paths
+    after one another.
+    """
+
+    lengths = np.array([len(path) for path in paths], dtype=np.int32)
+    coords = np.array([coords for path in paths for coords in path],
+                      dtype=np.int32).reshape(-1, 3)
+
+    return lengths, coords
+
+
+def decode_paths(lengths: np.ndarray, coords: np.ndarray) ->\
+        list[list[tuple[int, int, int]]]:
+    """
+    Returns the paths encoded by encode_paths.
+    """
+
+    all_coords: list[tuple[int, int, int]] =\
+        [tuple(row) for row in coords.tolist()]
+    ends: list[int] = np.cumsum(lengths).tolist()
+
+    return [all_coords[end - length:end]
+            for length, end in zip(lengths.tolist(), ends)]
+
+
+def write_checkpoint(filename: str, state: dict[str, Any]) -> None:
+    """
+    Writes the state of a run to a checkpoint file. Entries whose name ends
+    in "paths" hold wire paths and are stored as arrays, all other entries
+    must fit in JSON.
+    """
+
+    arrays: dict[str, np.ndarray] = {}
+    metadata: dict[str, Any] = {"version": CHECKPOINT_VERSION}
+    for name, value in state.items():
+        if name.endswith("paths"):
+            arrays[f"{name}_lengths"], arrays[f"{name}_coords"] =\
+                encode_paths(value)
+        else:
+            metadata[name] = value
+    arrays["metadata"] = np.array(json.dumps(metadata))
+
+    # Write to a temporary file first, so the checkpoint is never partial
+    temporary_filename: str = f"{filename}.tmp"
+    with open(temporary_filename, "wb") as file:
+        np.savez_compressed(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_filename, filename)
+
+
+def read_checkpoint(filename: str) -> dict[str, Any]:
+    """
+    Returns the state of a run from a checkpoint file.
+    """
+
+    with np.load(filename) as arrays:
+        state: dict[str, Any] = json.loads(str(arrays["metadata"]))
+        if state.pop("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unknown checkpoint version in {filename}")
+
+        for name in arrays.files:
+            if name.endswith("paths_lengths"):
+                path_name: str = name[:-len("_lengths")]
+                state[path_name] = decode_paths(arrays[name],
+                                                arrays[f"{path_name}_coords"])
+
+    return state
+
+
+class Checkpointer:
+    """ Writes checkpoints of a run in a background thread, so the run
+        itself only takes a snapshot of its state. A snapshot which is
+        still waiting to be written is replaced by a newer one.
+    """
+
+    def __init__(self, filename: str,
+                 interval: float = CHECKPOINT_INTERVAL) -> None:
+        self.filename = filename
+        self.interval = interval
+        self.next_save: float = time.monotonic() + interval
+
+        self.pending: Optional[dict[str, Any]] = None
+        self.closed: bool = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.write_pending, daemon=True)
+        self.thread.start()
+
+    def is_due(self) -> bool:
+        """
+        Returns True if the interval since the last checkpoint has passed.
+        """
+
+        return time.monotonic() >= self.next_save
+
+    def save(self, state: dict[str, Any]) -> None:
+        """
+        Hands a snapshot of the state of the run to the writer thread.
+        """
+
+        with self.condition:
+            self.pending = state
+            self.condition.notify()
+
+        self.next_save = time.monotonic() + self.interval
+
+    def write_pending(self) -> None:
+        """
+        Writes snapshots as they come in, until the checkpointer is closed.
+        """
+
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                state, self.pending = self.pending, None
+
+            if state is None:
+                return
+            write_checkpoint(self.filename, state)
+
+    def close(self) -> None:
+        """
+        Waits until the last snapshot is written.
+        """
+
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+        self.thread.join()
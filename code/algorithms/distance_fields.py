@@ -0,0 +1,118 @@
+import hashlib
+import os
+import sys
+import zipfile
+import numpy as np
+from classes.chip import Chip
+
+sys.path.append("../classes")
+
+# Distance fields per print file and grid shape, shared by all chips
+# (and so all netlists) which use the same print file
+DISTANCE_FIELDS: dict[str, dict[tuple[int, int, int], list[int]]] = {}
+
+# Largest number of distances (gates times cells) to keep, larger chips
+# use the manhattan distance instead, as a field per gate takes too long
+# to create and too much memory to keep
+MAX_FIELD_SIZE: int = 10_000_000
+
+
+def get_cache_key(chip: "Chip") -> str:
+    """
+    Returns a key which changes with the gate layout and grid shape.
+    """
+
+    with open(chip.print_filename, "rb") as file:
+        content: bytes = file.read()
+
+    shape: str = "x".join(str(size) for size in chip.grid.shape)
+
+    return f"{hashlib.sha1(content).hexdigest()}-{shape}"
+
+
+def create_distance_fields(chip: "Chip") -> np.ndarray:
+    """
+    Returns, per gate in the order of chip.gates, the number of steps from
+    every cell to that gate when walking around all other gates. Gate cells
+    get a distance too, but are never walked through. Cells which cannot
+    reach a gate get the cell count as distance.
+    """
+
+    shape: tuple[int, ...] = chip.grid.shape
+    gate_count: int = len(chip.gates)
+    free = chip.grid.gate_ids == 0
+
+    # Breadth first search from all gates at once, one layer per step
+    distances = np.full((gate_count,) + shape, -1, dtype=np.int32)
+    frontier = np.zeros((gate_count,) + shape, dtype=bool)
+    for index, gate in enumerate(chip.gates.values()):
+        distances[index, gate.get_z(), gate.get_y(), gate.get_x()] = 0
+        frontier[index, gate.get_z(), gate.get_y(), gate.get_x()] = True
+
+    step: int = 0
+    while frontier.any():
+        step += 1
+
+        # Move the frontier one cell along every axis
+        reached = np.zeros_like(frontier)
+        for axis in range(1, 4):
+            source = [slice(None)] * 4
+            target = [slice(None)] * 4
+            source[axis], target[axis] = slice(None, -1), slice(1, None)
+            reached[tuple(target)] |= frontier[tuple(source)]
+            reached[tuple(source)] |= frontier[tuple(target)]
+
+        reached &= distances < 0
+        distances[reached] = step
+
+        # Only free cells are walked through
+        frontier = reached & free
+
+    distances[distances < 0] = chip.grid.cell_count
+
+    return distances.reshape(gate_count, -1)
+
+
+def load_distance_fields(chip: "Chip") ->\
+        dict[tuple[int, int, int], list[int]]:
+    """
+    Returns the distance field per gate coordinates, from memory, from the
+    cache file next to the print file or else newly created and cached.
+    Returns no fields if the chip is too large.
+    """
+
+    if len(chip.gates) * chip.grid.cell_count > MAX_FIELD_SIZE:
+        return {}
+
+    key: str = get_cache_key(chip)
+
+    if key not in DISTANCE_FIELDS:
+        cache_filename: str =\
+            f"{os.path.splitext(chip.print_filename)[0]}.distances.npz"
+        fields = None
+
+        # Reuse the cache file if it was made for the same print and grid,
+        # a cache file which cannot be read is made again
+        if os.path.exists(cache_filename):
+            try:
+                with np.load(cache_filename) as cache:
+                    if str(cache["key"]) == key:
+                        fields = cache["fields"]
+            except (zipfile.BadZipFile, ValueError, KeyError, OSError):
+                fields = None
+
+        if fields is None:
+            fields = create_distance_fields(chip)
+
+            # Write to a temporary file of this process first, so the cache
+            # is never partial, also when several processes write it at once
+            temporary_filename: str =\
+                f"{cache_filename}.{os.getpid()}.tmp.npz"
+            np.savez(temporary_filename, key=np.array(key), fields=fields)
+            os.replace(temporary_filename, cache_filename)
+
+        DISTANCE_FIELDS[key] = {gate.get_coords(): field.tolist()
+                                for gate, field in zip(chip.gates.values(),
+                                                       fields)}
+
+    return DISTANCE_FIELDS[key]
@@ -1,20 +1,48 @@
+import random
 import time
 import sys
-import copy
+from typing import Any, Callable, Optional
 from classes.chip import Chip
+from classes.conflict_index import ConflictIndex
+from classes.grid import Grid
 from classes.wire import Wire
-from .random_alg import lay_wire, random_reassign_wire
-from analysis.save import save_to_file
+from .budget import Budget
+from .checkpoint import Checkpointer, get_checkpoint_path
+from .random_alg import lay_valid_wire
+from analysis.save import RunLogger
 sys.path.append("../analysis")
 sys.path.append("../classes")
 sys.path.append("..")
 
+# Weight of every cell a wire shares with other wires, against a weight of
+# one for each wire, when wires are selected by congestion
+CONFLICT_WEIGHT: int = 10
+
 
 class HillClimber:
-    def __init__(self, chip_no: int, netlist_no: int, output_filename: str):
+    def __init__(self, chip_no: int, netlist_no: int, output_filename: str,
+                 log_format: str = "csv",
+                 router: Callable[['Wire', 'Grid'], None] = lay_valid_wire,
+                 checkpoint_interval: Optional[float] = None,
+                 move_selection: str = "cycle"):
+        self.chip_no = chip_no
+        self.netlist_no = netlist_no
         self.chip = Chip(chip_no, f"netlist_{netlist_no}.csv")
         self.costs: int
         self.output_filename: str = output_filename
+        self.log_format: str = log_format
+        self.iteration: int = 0
+
+        # Router used to replace a wire, randomly by default
+        self.router = router
+
+        # Seconds between checkpoints of a run, None for no checkpoints
+        self.checkpoint_interval = checkpoint_interval
+
+        # Wires are moved a thousand times in turn with "cycle", or picked
+        # at random, weighted by their intersections, with "congestion"
+        self.move_selection = move_selection
+        self.conflict_index: Optional['ConflictIndex'] = None
 
     def make_random_valid_solution(self) -> 'Chip':
         """
@@ -26,95 +54,177 @@ class HillClimber:
             for father in mother.get_destinations():
                 new_wire = Wire(mother, father)
                 self.chip.add_wire(new_wire)
-                lay_wire(new_wire, self.chip.grid)
                 # Randomly lay wires until father gate is found
-                while (new_wire.get_current_position() !=
-                       new_wire.father.get_coords()):
-                    random_reassign_wire(new_wire, self.chip.grid)
+                lay_valid_wire(new_wire, self.chip.grid)
         return (self.chip)
 
-    def check_score(self, chip_copy: "Chip") -> bool:
+    def check_score(self, difference: int) -> bool:
         """
-        Checks and updates a better chip and thus a better score.
+        Checks for a better score, keeps the moved wire if so and
+        undoes the move otherwise.
         """
 
-        # Cost of the chip after placing a new wire
-        copy_cost = chip_copy.calculate_costs()
-        # Update cost of the original chip
-        self.costs = self.chip.calculate_costs()
-
-        if (copy_cost < self.costs):
+        if (difference < 0):
             # Update chip to better version
-            self.chip = chip_copy
+            self.chip.commit_move()
+            self.costs = self.chip.calculate_costs()
             return True
 
+        self.chip.undo_move()
         return False
 
-    def run(self):
+    def get_state(self) -> dict[str, Any]:
         """
-        Runs hillclimber algorithm.
+        Returns the state a run can be resumed from, taken between two
+        iterations.
         """
 
-        # Get one valid solution
-        self.make_random_valid_solution()
+        return {"algorithm": "hillclimber", "chip_no": self.chip_no,
+                "netlist_no": self.netlist_no, "log_format": self.log_format,
+                "router": self.router.__name__,
+                "move_selection": self.move_selection,
+                "iteration": self.iteration,
+                "cumulative_duration": self.chip.cumulative_duration,
+                "random_state": random.getstate(),
+                "paths": [list(wire.get_path()) for wire in self.chip.wires]}
+
+    def set_state(self, state: dict[str, Any]) -> None:
+        """
+        Restores the chip, iteration and random number generator of a run
+        from the state made by get_state.
+        """
 
-        # Update the first score
+        self.chip.add_wire_paths(state["paths"])
         self.chip.calculate_costs()
+        self.iteration = state["iteration"]
+        self.chip.iteration = self.iteration
+        self.chip.cumulative_duration = state["cumulative_duration"]
+
+        version, internal_state, gauss_next = state["random_state"]
+        random.setstate((version, tuple(internal_state), gauss_next))
+
+    def start_run(self, state: Optional[dict[str, Any]]) ->\
+            tuple['RunLogger', Optional['Checkpointer']]:
+        """
+        Starts from a random valid solution, or from the state of an
+        earlier run, and returns the logger and checkpointer of the run.
+        """
+
+        if state is None:
+            # Get one valid solution
+            self.make_random_valid_solution()
+
+            # Update the first score
+            self.chip.calculate_costs()
+
+            # Writing original solved chip data to CSV file
+            logger = RunLogger(self.output_filename, self.log_format)
+            logger.log(self.chip)
+        else:
+            # Continue the data file from the checkpoint
+            self.set_state(state)
+            logger = RunLogger(self.output_filename, self.log_format,
+                               resume_size=state["log_size"])
+
+        if self.move_selection == "congestion":
+            self.conflict_index = self.chip.track_conflicts()
+
+        checkpointer: Optional['Checkpointer'] = None
+        if self.checkpoint_interval is not None:
+            checkpointer = Checkpointer(
+                get_checkpoint_path(self.output_filename),
+                self.checkpoint_interval)
+
+        return logger, checkpointer
+
+    def select_wire(self) -> int:
+        """
+        Returns the index of the wire to move next.
+        """
+
+        if self.conflict_index is None:
+            return (self.iteration // 1000) % len(self.chip.wires)
+
+        weights: list[int] = [1 + CONFLICT_WEIGHT * count
+                              for count in self.conflict_index.shared_cells]
+        return random.choices(range(len(weights)), weights)[0]
+
+    def save_checkpoint(self, checkpointer: 'Checkpointer',
+                        logger: 'RunLogger') -> None:
+        """
+        Hands the state of the run to the checkpointer, with the size of
+        the data file up to now.
+        """
+
+        state: dict[str, Any] = self.get_state()
+        state["log_size"] = logger.get_size()
+        checkpointer.save(state)
+
+    def run(self, budget: Optional['Budget'] = None,
+            state: Optional[dict[str, Any]] = None) -> 'Chip':
+        """
+        Runs hillclimber algorithm until the budget is spent, or until
+        'ctrl+C' without a budget. Continues from the state of an earlier
+        run if one is given.
+        """
+
+        if budget is None:
+            budget = Budget()
 
-        # Writing original solved chip data to CSV file
-        save_to_file(self.chip, self.output_filename)
-        iteration: int = 0
+        # Building the first solution counts towards the budget too
+        with budget:
+            logger, checkpointer = self.start_run(state)
 
-        # Start timer
-        start_time: float = time.time()
+            # Start timer
+            start_time: float = time.time()
 
-        while (True):
             try:
-                # Go through all the wires
-                for wire in range(len(self.chip.wires)):
-                    # Try and improve the wire a thousand times
-                    for _ in range(1000):
-                        # Update algorithm iteration number
-                        iteration += 1
+                while not budget.is_spent(self.chip.cost):
+                    if checkpointer is not None and checkpointer.is_due():
+                        self.save_checkpoint(checkpointer, logger)
 
-                        # Copy the original chip
-                        chip_copy = copy.deepcopy(self.chip)
+                    wire_index: int = self.select_wire()
 
-                        # Copy the current wire
-                        wire_copy = chip_copy.wires[wire]
+                    # Update algorithm iteration number
+                    self.iteration += 1
 
-                        # Randomly replace the wire
-                        random_reassign_wire(wire_copy, chip_copy.grid)
+                    # Replace the wire in place and get the
+                    # resulting difference in cost
+                    difference: int =\
+                        self.chip.move_wire(wire_index, self.router)
 
-                        # Find a new valid solution
-                        while (wire_copy.get_current_position() !=
-                               wire_copy.father.get_coords()):
-                            random_reassign_wire(wire_copy, chip_copy.grid)
+                    # Check for a better solution
+                    if (self.check_score(difference)):
+                        # Update chip iteration number
+                        self.chip.iteration = self.iteration
 
-                        # Check for a better solution
-                        if (self.check_score(chip_copy)):
-                            # Update chip iteration number
-                            self.chip.iteration = iteration
+                        # Get time for completed iteration
+                        completed_iteration_time = time.time()
 
-                            # Get time for completed iteration
-                            completed_iteration_time = time.time()
+                        # Calculate duration of iteration
+                        self.chip.iteration_duration =\
+                            completed_iteration_time - start_time
 
-                            # Calculate duration of iteration
-                            self.chip.iteration_duration =\
-                                completed_iteration_time - start_time
+                        # Update cumulative iteration duration
+                        self.chip.cumulative_duration +=\
+                            self.chip.iteration_duration
 
-                            # Update cumulative iteration duration
-                            self.chip.cumulative_duration +=\
-                                self.chip.iteration_duration
+                        # Reset timer
+                        start_time = time.time()
 
-                            # Reset timer
-                            start_time = time.time()
+                        # Save relevant chip data to file
+                        logger.log(self.chip)
 
-                            # Save relevant chip data to file
-                            save_to_file(self.chip, self.output_filename)
+                # Keep the final state, so the run can be continued
+                if checkpointer is not None:
+                    self.save_checkpoint(checkpointer, logger)
+            finally:
+                if checkpointer is not None:
+                    checkpointer.close()
 
-            except KeyboardInterrupt:
-                break
+                # Write the remaining buffered chip data
+                logger.close()
 
-        print(f"\nRuntime: {round(self.chip.cumulative_duration, 3)} seconds.")
+        print(f"\nStopped: {budget.stop_reason}.")
+        print(f"Runtime: {round(self.chip.cumulative_duration, 3)} seconds.")
         return self.chip
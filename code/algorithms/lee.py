@@ -0,0 +1,203 @@
+import sys
+from typing import Optional
+import numpy as np
+from classes.gate import Gate
+from classes.grid import Grid
+from classes.wire import Wire
+from .astar import AstarAlg
+
+sys.path.append("../classes")
+sys.path.append("..")
+
+# Largest rounding difference between the distance of a cell and the
+# distance of its predecessor plus the cost of entering the cell
+DISTANCE_TOLERANCE: float = 1e-6
+
+
+def shift_minimum(distances: np.ndarray) -> np.ndarray:
+    """
+    Returns, per cell, the lowest distance of its six neighbours.
+    """
+
+    lowest = np.full_like(distances, np.inf)
+
+    for axis in range(3):
+        lower = [slice(None)] * 3
+        upper = [slice(None)] * 3
+        lower[axis], upper[axis] = slice(None, -1), slice(1, None)
+        np.minimum(lowest[tuple(upper)], distances[tuple(lower)],
+                   out=lowest[tuple(upper)])
+        np.minimum(lowest[tuple(lower)], distances[tuple(upper)],
+                   out=lowest[tuple(lower)])
+
+    return lowest
+
+
+def create_wavefront(grid: "Grid", mother_coords: tuple[int, int, int],
+                     father_coords: tuple[int, int, int],
+                     extra_costs: Optional[np.ndarray] = None) ->\
+        tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the cost of entering every cell and the cheapest cost of
+    reaching every cell from the mother gate. The wavefront moves one
+    shell of cells per step, as whole-array operations, until the cost
+    of the father gate can no longer improve.
+    """
+
+    mother_index: tuple[int, int, int] = mother_coords[::-1]
+    father_index: tuple[int, int, int] = father_coords[::-1]
+
+    # Wires can pass free cells, and may enter but not pass the father
+    walkable = grid.gate_ids == 0
+    enterable = walkable.copy()
+    enterable[father_index] = True
+    walkable[mother_index] = True
+
+    # A cell with a wire costs 300, a free cell 1, gates can't be entered
+    entry_costs = np.where(grid.wire_counts >= 1, 300.0, 1.0)
+    if extra_costs is not None:
+        entry_costs += extra_costs
+    entry_costs[~enterable] = np.inf
+
+    distances = np.full(grid.shape, np.inf)
+    distances[mother_index] = 0
+
+    while True:
+        reached = shift_minimum(np.where(walkable, distances, np.inf)) +\
+            entry_costs
+        improved = reached < distances
+        if not improved.any():
+            break
+        distances = np.minimum(distances, reached)
+
+        # Cells which only improved to more than the father's cost can
+        # never make the father cheaper
+        if reached[improved].min() >= distances[father_index]:
+            break
+
+    return entry_costs.reshape(-1), distances.reshape(-1)
+
+
+def trace_back(grid: "Grid", entry_costs: np.ndarray,
+               distances: np.ndarray, mother_cell: int,
+               father_cell: int) -> list[tuple[int, int, int]]:
+    """
+    Follows the cheapest costs back from the father to the mother gate
+    and returns the path, from mother to father.
+    """
+
+    wire_path: list[tuple[int, int, int]] = [grid.cell_coords[father_cell]]
+    cell: int = father_cell
+
+    while cell != mother_cell:
+        for previous_cell in grid.neighbours[cell]:
+            # Only the mother and free cells pass a wire on
+            if previous_cell != mother_cell and grid.is_gate(previous_cell):
+                continue
+            if abs(distances[previous_cell] + entry_costs[cell] -
+                   distances[cell]) <= DISTANCE_TOLERANCE:
+                break
+        else:
+            raise RuntimeError(f"No cheapest predecessor of cell {cell}"
+                               " while tracing back a Lee path")
+        cell = previous_cell
+        wire_path.append(grid.cell_coords[cell])
+
+    wire_path.reverse()
+
+    return wire_path
+
+
+def find_lee_path(grid: "Grid", mother_coords: tuple[int, int, int],
+                  father_coords: tuple[int, int, int],
+                  extra_costs: Optional[np.ndarray] = None) ->\
+        tuple[list[tuple[int, int, int]], int]:
+    """
+    Returns the cheapest path between two gates and the number of cells
+    the wavefront reached.
+    """
+
+    entry_costs, distances =\
+        create_wavefront(grid, mother_coords, father_coords, extra_costs)
+    father_cell: int = grid.encode(father_coords)
+
+    # Exit if the wavefront never reached the father
+    if distances[father_cell] == np.inf:
+        print("Can't lay wire")
+        sys.exit(1)
+
+    wire_path: list[tuple[int, int, int]] =\
+        trace_back(grid, entry_costs, distances, grid.encode(mother_coords),
+                   father_cell)
+
+    return wire_path, int(np.isfinite(distances).sum())
+
+
+def lay_lee_wire(wire: "Wire", grid: "Grid") -> None:
+    """
+    Lays the cheapest wire between its mother and father gate, for use as
+    a router in Chip.move_wire.
+    """
+
+    wire_path, _ = find_lee_path(grid, wire.mother.get_coords(),
+                                 wire.father.get_coords())
+
+    for coords in wire_path[1:-1]:
+        grid.add_wire_unit(grid.encode(coords))
+    wire.set_path(wire_path)
+
+
+class LeeAlg(AstarAlg):
+    """ Implements the Lee maze router. Instead of checking one segment at
+        a time like A*, the wavefront of reachable cells grows one whole
+        shell per step as an array operation over the grid, after which
+        the cheapest path is traced back. Uses the same costs, sorting
+        modes and heuristics as A*.
+    """
+
+    def get_extra_costs(self, mother_coords: tuple[int, int, int],
+                        father_coords: tuple[int, int, int]) ->\
+            Optional[np.ndarray]:
+        """
+        Returns the heuristic cost of entering every cell.
+        """
+
+        if self.heuristic.heuristic is None:
+            return None
+
+        shape: tuple[int, ...] = self.chip.grid.shape
+        extra_costs = np.zeros(self.chip.grid.cell_count)
+
+        if self.heuristic.heuristic in ["avoid_gates", "all"]:
+            extra_costs += self.heuristic.gate_cost_field
+
+            # The mother and father gate of the wire do not count
+            for gate_coords in (mother_coords, father_coords):
+                close_cells: list[int] =\
+                    list(self.heuristic.get_close_cells(self.chip,
+                                                        gate_coords))
+                extra_costs[close_cells] -= 50
+
+        if self.heuristic.heuristic in ["avoid_low", "all"]:
+            extra_costs += self.heuristic.layer_cost_field
+
+        return extra_costs.reshape(shape)
+
+    def draw_wire(self, mother: "Gate", father: "Gate") ->\
+            list[tuple[int, int, int]]:
+        """
+        Determines the cheapest path between two gates and draws the wire.
+        """
+
+        mother_coords: tuple[int, int, int] = mother.get_coords()
+        father_coords: tuple[int, int, int] = father.get_coords()
+
+        wire_path, reached_cells =\
+            find_lee_path(self.chip.grid, mother_coords, father_coords,
+                          self.get_extra_costs(mother_coords, father_coords))
+        self.nodes_expanded += reached_cells
+
+        # Update 3D array
+        self.update_grid(wire_path)
+
+        return wire_path
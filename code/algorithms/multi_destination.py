@@ -0,0 +1,279 @@
+import heapq
+import sys
+import time
+from typing import Optional
+from analysis.save import RunLogger
+from classes.gate import Gate
+from classes.wire import Wire
+from .astar import AstarAlg, WireSegment
+
+sys.path.append("../analysis")
+sys.path.append("../classes")
+sys.path.append("..")
+
+
+class SearchTree:
+    """ Holds the state of a search tree grown from one mother gate: the
+        open heap, the cheapest open segment per cell, the checked segments
+        per cell and the destination cells which still have to be reached.
+    """
+
+    def __init__(self, mother_segment: "WireSegment",
+                 target_cells: list[int]) -> None:
+        self.mother_segment = mother_segment
+        self.target_cells = target_cells
+        self.open_heap: list[tuple[float, int, "WireSegment"]] = []
+        self.open_segments: dict[int, "WireSegment"] = {}
+        self.closed_segments: dict[int, "WireSegment"] = {}
+        self.push_count: int = 0
+
+        self.push(mother_segment)
+
+    def push(self, segment: "WireSegment") -> None:
+        """
+        Adds a segment to the open heap, latest first on equal cost.
+        """
+
+        self.push_count += 1
+        heapq.heappush(self.open_heap, (segment.total_cost, -self.push_count,
+                                        segment))
+        self.open_segments[segment.cell] = segment
+
+    def rebuild_heap(self) -> None:
+        """
+        Rebuilds the open heap from the open segments, dropping replaced
+        entries and using their current total costs.
+        """
+
+        self.open_heap = []
+        for segment in list(self.open_segments.values()):
+            self.push(segment)
+
+
+class MultiDestinationAstar(AstarAlg):
+    """ Implements a routing mode which grows one A* search tree from every
+        mother gate and extracts the wires to all of its destinations from
+        it. The search is guided by the distance to the nearest
+        destination which has not been reached yet. After a wire is laid,
+        only the part of the tree which runs through the new wire's cells
+        is thrown away and searched again, the rest is reused.
+
+        The cost of a segment is shared by all destinations of a tree, so
+        the avoid_gates penalty skips the mother and all of its
+        destinations, where plain A* only skips the mother and the father
+        of the wire. Routes can therefore differ from those of "astar",
+        so this mode is not offered in main.py or the benchmark.
+    """
+
+    def get_nearest_target(self, tree: "SearchTree",
+                           segment: "WireSegment") -> tuple[int, int, int]:
+        """
+        Returns the coordinates of the nearest destination of a tree.
+        """
+
+        return min((self.chip.grid.decode(cell) for cell in tree.target_cells),
+                   key=lambda target: self.heuristic.
+                   estimate_distance(segment, target))
+
+    def expand(self, tree: "SearchTree", current_segment: "WireSegment",
+               excluded_gates: list[tuple[int, int, int]]) -> None:
+        """
+        Adds the segments around a checked segment to the open heap.
+        """
+
+        grid = self.chip.grid
+        mother_coords: tuple[int, int, int] = tree.mother_segment.position
+
+        for cell in grid.neighbours[current_segment.cell]:
+            # Skip gates other than the destinations, and checked cells
+            if (grid.is_gate(cell) and cell not in tree.target_cells) or\
+                    cell in tree.closed_segments:
+                continue
+
+            # Assign costs to the next segment
+            segment: "WireSegment" =\
+                WireSegment(current_segment, grid.decode(cell), cell)
+            self.heuristic.assign_next_segment_costs(
+                self.chip, current_segment, segment, mother_coords,
+                self.get_nearest_target(tree, segment),
+                excluded_gates)
+
+            # Skip segment if there already is a cheaper path to its cell
+            open_segment: Optional["WireSegment"] =\
+                tree.open_segments.get(cell)
+            if open_segment is not None and\
+                    open_segment.wire_cost <= segment.wire_cost:
+                continue
+
+            tree.push(segment)
+
+    def search_next(self, tree: "SearchTree",
+                    excluded_gates: list[tuple[int, int, int]]) ->\
+            "WireSegment":
+        """
+        Grows the tree until the cheapest remaining destination is reached
+        and returns its segment.
+        """
+
+        while len(tree.open_heap) > 0:
+            current_segment: "WireSegment" = heapq.heappop(tree.open_heap)[2]
+
+            # Skip segments which were replaced or thrown away
+            if tree.open_segments.get(current_segment.cell) is not\
+                    current_segment:
+                continue
+            del tree.open_segments[current_segment.cell]
+            tree.closed_segments[current_segment.cell] = current_segment
+            self.nodes_expanded += 1
+
+            # Destinations are end points, never expanded
+            if current_segment.cell in tree.target_cells:
+                return current_segment
+
+            self.expand(tree, current_segment, excluded_gates)
+
+        # Exit if open heap is empty and a father was not found
+        print("Can't lay wire")
+        sys.exit(1)
+
+    def invalidate(self, tree: "SearchTree", changed_cells: set[int],
+                   excluded_gates: list[tuple[int, int, int]]) -> None:
+        """
+        Throws away every segment whose path runs through a changed cell
+        and re-expands the checked segments bordering on them.
+        """
+
+        grid = self.chip.grid
+        is_invalid: dict[int, bool] = {}
+        removed_cells: set[int] = set()
+
+        # Walk up the path of every segment until its validity is known
+        for segments in (tree.closed_segments, tree.open_segments):
+            for cell, segment in list(segments.items()):
+                chain: list["WireSegment"] = []
+                ancestor: Optional["WireSegment"] = segment
+                invalid: bool = False
+
+                while ancestor is not None:
+                    if id(ancestor) in is_invalid:
+                        invalid = is_invalid[id(ancestor)]
+                        break
+                    chain.append(ancestor)
+                    if ancestor.cell in changed_cells:
+                        invalid = True
+                        break
+                    ancestor = ancestor.previous_segment
+
+                for chained_segment in chain:
+                    is_invalid[id(chained_segment)] = invalid
+
+                if invalid:
+                    del segments[cell]
+                    removed_cells.add(cell)
+
+        # Search again from the checked segments next to thrown away cells,
+        # apart from reached destinations, which are end points
+        for segment in list(tree.closed_segments.values()):
+            if segment is not tree.mother_segment and\
+                    grid.is_gate(segment.cell):
+                continue
+            if any(cell in removed_cells
+                   for cell in grid.neighbours[segment.cell]):
+                self.expand(tree, segment, excluded_gates)
+
+    def route_destinations(self, mother: "Gate",
+                           fathers: list["Gate"]) -> None:
+        """
+        Routes the wires from a mother gate to all of its destinations
+        with one search tree.
+        """
+
+        grid = self.chip.grid
+        mother_coords: tuple[int, int, int] = mother.get_coords()
+        excluded_gates: list[tuple[int, int, int]] =\
+            [mother_coords] + [father.get_coords() for father in fathers]
+
+        # Fathers which still have to be reached, per cell
+        fathers_at: dict[int, list["Gate"]] = {}
+        for father in fathers:
+            fathers_at.setdefault(grid.encode(father.get_coords()),
+                                  []).append(father)
+
+        mother_segment: "WireSegment" =\
+            WireSegment(None, mother_coords, grid.encode(mother_coords))
+        tree = SearchTree(mother_segment, [grid.encode(father.get_coords())
+                                           for father in fathers])
+
+        while tree.target_cells:
+            target_segment: "WireSegment" =\
+                self.search_next(tree, excluded_gates)
+            father: "Gate" = fathers_at[target_segment.cell].pop()
+
+            # Create path, from mother to father, and lay the wire
+            wire_path: list[tuple[int, int, int]] = []
+            segment: Optional["WireSegment"] = target_segment
+            while segment is not None:
+                wire_path.append(segment.position)
+                segment = segment.previous_segment
+            wire_path.reverse()
+            self.update_grid(wire_path)
+
+            new_wire: "Wire" = Wire(mother, father)
+            new_wire.set_path(wire_path)
+            self.chip.add_wire(new_wire)
+            tree.target_cells.remove(target_segment.cell)
+
+            if not tree.target_cells:
+                break
+
+            # Throw away the part of the tree which the new wire made more
+            # expensive, then order the rest on the remaining destinations
+            changed_cells: set[int] = {grid.encode(coords)
+                                       for coords in wire_path[1:]}
+            self.invalidate(tree, changed_cells, excluded_gates)
+            for open_segment in tree.open_segments.values():
+                open_segment.manhattan_cost =\
+                    self.heuristic.estimate_distance(
+                        open_segment,
+                        self.get_nearest_target(tree, open_segment))
+                open_segment.total_cost =\
+                    open_segment.wire_cost + open_segment.manhattan_cost
+            tree.rebuild_heap()
+
+    def run(self) -> None:
+        """
+        Lay all wires, one search tree per mother gate, and return chip.
+        """
+
+        # Start timer
+        start_time: float = time.time()
+
+        # Group the destinations per mother gate, in sorted order
+        sorted_connections: list[tuple["Gate", "Gate", int]] =\
+            self.heuristic.sort_desired_connections(self.chip)
+        destinations: dict["Gate", list["Gate"]] = {}
+        for mother, father, _ in sorted_connections:
+            destinations.setdefault(mother, []).append(father)
+
+        for mother, fathers in destinations.items():
+            print(f"Drawing {len(fathers)} wire(s) from {mother}")
+            self.route_destinations(mother, fathers)
+
+        # Determine duration of algorithm
+        total_time: float = time.time() - start_time
+        print(f"Runtime: {round(total_time, 2)} seconds.")
+        print(f"Expanded {self.nodes_expanded} segments"
+              f" ({round(self.nodes_expanded / max(total_time, 1e-9))}"
+              f" per second).")
+
+        # Assing duration to chip
+        self.chip.iteration_duration = total_time
+        self.chip.cumulative_duration += self.chip.iteration_duration
+
+        # Determine chip cost
+        self.chip.calculate_costs()
+
+        # Save relevant chip data to file
+        if self.output_filename is not None:
+            with RunLogger(self.output_filename, self.log_format) as logger:
+                logger.log(self.chip)
@@ -0,0 +1,218 @@
+import random
+import sys
+import time
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from analysis.save import RunLogger
+from classes.chip import Chip
+from classes.gate import Gate
+from classes.wire import Wire
+from .astar import AstarAlg
+
+sys.path.append("../analysis")
+sys.path.append("../classes")
+sys.path.append("..")
+
+
+class ChipSnapshot:
+    """ Holds the state of a chip after routing a prefix of an ordering:
+        a copy of the wire counts, the running cost totals of the grid and
+        the wires laid so far. Wires are not changed after they are laid,
+        so they are shared between snapshots.
+    """
+
+    def __init__(self, chip: "Chip") -> None:
+        self.wire_counts: np.ndarray = chip.grid.wire_counts.copy()
+        self.wire_units: int = chip.grid.wire_units
+        self.intersection_units: int = chip.grid.intersection_units
+        self.wires: list["Wire"] = list(chip.wires)
+
+    def restore(self, chip: "Chip") -> None:
+        """
+        Puts the chip back in the state of the snapshot.
+        """
+
+        # Copy in place, so the flat view on the wire counts stays valid
+        chip.grid.wire_counts[...] = self.wire_counts
+        chip.grid.wire_units = self.wire_units
+        chip.grid.intersection_units = self.intersection_units
+        chip.wires = list(self.wires)
+
+
+class PrefixNode:
+    """ Implements a node of the prefix trie. Its path from the root is a
+        prefix of connection indices, and it may hold the snapshot of the
+        chip after routing that prefix.
+    """
+
+    def __init__(self, parent: Optional["PrefixNode"] = None,
+                 connection: Optional[int] = None) -> None:
+        self.parent = parent
+        self.connection = connection
+        self.children: dict[int, "PrefixNode"] = {}
+        self.snapshot: Optional["ChipSnapshot"] = None
+
+
+class PrefixTrie:
+    """ Implements a trie of routed prefixes of connection orderings. At
+        most a fixed number of snapshots is kept, the least recently used
+        ones are dropped first, together with the nodes which lead to no
+        snapshot anymore.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.root = PrefixNode()
+        self.recently_used: OrderedDict[int, "PrefixNode"] = OrderedDict()
+
+    def find_longest(self, ordering: list[int]) ->\
+            tuple[int, Optional["ChipSnapshot"]]:
+        """
+        Returns the length and snapshot of the longest cached prefix of an
+        ordering.
+        """
+
+        node: "PrefixNode" = self.root
+        length: int = 0
+        snapshot: Optional["ChipSnapshot"] = None
+
+        for depth, connection in enumerate(ordering, 1):
+            node = node.children.get(connection)
+            if node is None:
+                break
+            if node.snapshot is not None:
+                length, snapshot = depth, node.snapshot
+                self.recently_used.move_to_end(id(node))
+
+        return length, snapshot
+
+    def store(self, prefix: list[int], snapshot: "ChipSnapshot") -> None:
+        """
+        Caches the snapshot of a prefix, dropping the least recently used
+        snapshot if the trie is full.
+        """
+
+        node: "PrefixNode" = self.root
+        for connection in prefix:
+            if connection not in node.children:
+                node.children[connection] = PrefixNode(node, connection)
+            node = node.children[connection]
+
+        node.snapshot = snapshot
+        self.recently_used[id(node)] = node
+        self.recently_used.move_to_end(id(node))
+
+        while len(self.recently_used) > self.capacity:
+            _, evicted = self.recently_used.popitem(last=False)
+            evicted.snapshot = None
+
+            # Remove the nodes which lead to no snapshot anymore
+            while evicted.parent is not None and not evicted.children and\
+                    evicted.snapshot is None:
+                del evicted.parent.children[evicted.connection]
+                evicted = evicted.parent
+
+
+class OrderingSearch(AstarAlg):
+    """ Implements a search over connection orderings. Starting from the
+        sorted order, two connections are swapped at a time and the swap is
+        kept if the chip gets cheaper. The chip is snapshotted after every
+        routed prefix, so an ordering resumes from the longest prefix it
+        shares with an ordering routed before, and stops as soon as the
+        wires laid so far cost as much as the best chip. Mix it in before
+        another router, like BidirectionalAstar, to search with that one.
+    """
+
+    def __init__(self, chip_no: int, netlist_no: int,
+                 output_filename: Optional[str],
+                 sorting_mode: Optional[str], heuristic: Optional[str],
+                 orderings: int = 200, cache_size: int = 1000,
+                 seed: int = 1, log_format: str = "csv") -> None:
+        self.orderings = orderings
+        self.trie = PrefixTrie(cache_size)
+        self.random = random.Random(seed)
+        self.wires_routed: int = 0
+        super().__init__(chip_no, netlist_no, output_filename,
+                         sorting_mode, heuristic, log_format)
+
+    def route_ordering(self, connections: list[tuple["Gate", "Gate", int]],
+                       ordering: list[int], best_cost: float) -> float:
+        """
+        Routes the connections in the given order, resuming from the
+        longest cached prefix, and returns the cost of the chip, or
+        infinity if it can no longer beat the best cost.
+        """
+
+        length, snapshot = self.trie.find_longest(ordering)
+        if snapshot is None:
+            self.empty_snapshot.restore(self.chip)
+        else:
+            snapshot.restore(self.chip)
+
+        for depth in range(length, len(ordering)):
+            if self.chip.calculate_costs() >= best_cost:
+                return float("inf")
+
+            mother, father, _ = connections[ordering[depth]]
+            self.chip.add_wire(self.create_wire(mother, father))
+            self.wires_routed += 1
+            self.trie.store(ordering[:depth + 1], ChipSnapshot(self.chip))
+
+        return self.chip.calculate_costs()
+
+    def run(self) -> None:
+        """
+        Searches connection orderings and keeps the cheapest chip.
+        """
+
+        # Start timer
+        start_time: float = time.time()
+
+        connections: list[tuple["Gate", "Gate", int]] =\
+            self.heuristic.sort_desired_connections(self.chip)
+        self.empty_snapshot = ChipSnapshot(self.chip)
+
+        best_ordering: list[int] = list(range(len(connections)))
+        best_cost: float = self.route_ordering(connections, best_ordering,
+                                               float("inf"))
+        best_snapshot = ChipSnapshot(self.chip)
+        print(f"Ordering 1: cost {best_cost}")
+
+        # With fewer than two connections there is only one ordering
+        orderings: int = self.orderings if len(connections) >= 2 else 1
+
+        for attempt in range(2, orderings + 1):
+            # Swap two connections of the best ordering
+            ordering: list[int] = list(best_ordering)
+            first, second = self.random.sample(range(len(ordering)), 2)
+            ordering[first], ordering[second] =\
+                ordering[second], ordering[first]
+
+            cost: float = self.route_ordering(connections, ordering,
+                                              best_cost)
+            if cost < best_cost:
+                best_cost, best_ordering = cost, ordering
+                best_snapshot = ChipSnapshot(self.chip)
+                print(f"Ordering {attempt}: cost {best_cost}")
+
+        best_snapshot.restore(self.chip)
+
+        # Determine duration of algorithm
+        total_time: float = time.time() - start_time
+        print(f"Runtime: {round(total_time, 2)} seconds.")
+        print(f"Routed {self.wires_routed} wires for {orderings}"
+              f" orderings, instead of"
+              f" {orderings * len(connections)}.")
+
+        # Assing duration to chip
+        self.chip.iteration_duration = total_time
+        self.chip.cumulative_duration += self.chip.iteration_duration
+
+        # Determine chip cost
+        self.chip.calculate_costs()
+
+        # Save relevant chip data to file
+        if self.output_filename is not None:
+            with RunLogger(self.output_filename, self.log_format) as logger:
+                logger.log(self.chip)
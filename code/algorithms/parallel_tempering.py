@@ -0,0 +1,261 @@
+import math
+import os
+import random
+import signal
+import sys
+import time
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from typing import Any, Optional
+from analysis.save import RunLogger
+from classes.chip import Chip
+from classes.shared_chip import SharedChip, attach_shared_chip
+from .budget import Budget
+from .hill_climber import HillClimber
+from .random_alg import lay_valid_wire
+
+sys.path.append("../analysis")
+sys.path.append("../classes")
+sys.path.append("..")
+
+
+def run_replica(chip_no: int, netlist_no: int, seed: int,
+                connection: Connection, shared_name: str) -> None:
+    """
+    Worker process for one replica. Repeatedly receives a temperature and
+    a number of moves, runs them at that temperature and sends back its
+    current cost, the number of accepted moves and its best chip if that
+    improved.
+    """
+
+    # Interruptions are handled by the coordinating process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    random.seed(a=seed)
+    attach_shared_chip(chip_no, shared_name)
+
+    # Start from one random valid solution
+    climber = HillClimber(chip_no, netlist_no, None)
+    chip = climber.make_random_valid_solution()
+    best_cost: int = chip.calculate_costs()
+    best: Optional[tuple[int, int, int, list[list[tuple[int, int, int]]]]] =\
+        (best_cost, chip.wirecount, chip.intersectioncount,
+         [list(wire.get_path()) for wire in chip.wires])
+
+    while True:
+        message: Optional[tuple[float, int]] = connection.recv()
+        if message is None:
+            break
+
+        temperature, steps = message
+        accepted: int = 0
+
+        for _ in range(steps):
+            wire: int = random.randrange(len(chip.wires))
+            difference: int = chip.move_wire(wire, lay_valid_wire)
+
+            # Metropolis criterion at the fixed replica temperature
+            if (difference <= 0):
+                chance: float = 1
+            elif (temperature <= 0):
+                chance = 0
+            else:
+                chance = math.exp(- difference / temperature)
+
+            if random.random() < chance:
+                chip.commit_move()
+                accepted += 1
+
+                # Remember the best chip of this replica
+                if (chip.calculate_costs() < best_cost):
+                    best_cost = chip.cost
+                    best = (best_cost, chip.wirecount,
+                            chip.intersectioncount,
+                            [list(wire.get_path()) for wire in chip.wires])
+            else:
+                chip.undo_move()
+
+        connection.send((chip.calculate_costs(), accepted, best))
+        best = None
+
+    connection.close()
+
+
+class ParallelTempering:
+    """
+    Implements parallel tempering: several simulated annealing replicas at
+    fixed temperatures run in separate processes and periodically
+    exchange temperatures with the replica-exchange acceptance test.
+    """
+
+    def __init__(self, chip_no: int, netlist_no: int, output_filename: str,
+                 replicas: Optional[int] = None, min_temp: float = 10,
+                 max_temp: float = 100000, steps_per_round: int = 1000,
+                 seed: int = 1, log_format: str = "csv"):
+        self.chip_no = chip_no
+        self.netlist_no = netlist_no
+        self.output_filename = output_filename
+        self.steps_per_round = steps_per_round
+        self.seed = seed
+        self.log_format = log_format
+
+        if replicas is None:
+            replicas = max(os.cpu_count() or 1, 2)
+        if replicas < 1:
+            raise ValueError("Parallel tempering needs at least one replica")
+
+        # Geometric temperature ladder from cold to hot
+        ratio: float = (max_temp / min_temp) ** (1 / max(replicas - 1, 1))
+        self.temperatures: list[float] =\
+            [min_temp * ratio ** index for index in range(replicas)]
+
+        # Statistics per replica and per neighbouring temperature pair
+        self.accepted_moves: list[int] = [0] * replicas
+        self.tried_moves: list[int] = [0] * replicas
+        self.accepted_swaps: list[int] = [0] * (replicas - 1)
+        self.tried_swaps: list[int] = [0] * (replicas - 1)
+
+        self.best: Any = None
+
+    def exchange_replicas(self, replica_at: list[int], costs: list[int],
+                          round_no: int) -> None:
+        """
+        Attempts to swap neighbouring temperatures, alternating between
+        even and odd pairs every round.
+        """
+
+        for low in range(round_no % 2, len(self.temperatures) - 1, 2):
+            cold: int = replica_at[low]
+            hot: int = replica_at[low + 1]
+            self.tried_swaps[low] += 1
+
+            # Replica-exchange acceptance test
+            exponent: float = (costs[cold] - costs[hot]) *\
+                (1 / self.temperatures[low] - 1 / self.temperatures[low + 1])
+            if exponent >= 0 or random.random() < math.exp(exponent):
+                replica_at[low], replica_at[low + 1] = hot, cold
+                self.accepted_swaps[low] += 1
+
+    def collect(self, replica: int, connection: Connection,
+                costs: list[int]) -> None:
+        """
+        Receives the results of one replica's round.
+        """
+
+        cost, accepted, best = connection.recv()
+        costs[replica] = cost
+        self.accepted_moves[replica] += accepted
+        self.tried_moves[replica] += self.steps_per_round
+
+        # Keep the global best chip
+        if best is not None and (self.best is None or best[0] < self.best[0]):
+            self.best = best
+
+    def report(self) -> None:
+        """
+        Prints the move acceptance rate per replica and the swap
+        acceptance rate per neighbouring temperature pair.
+        """
+
+        for replica, tried in enumerate(self.tried_moves):
+            rate: float = self.accepted_moves[replica] / max(tried, 1)
+            print(f"Replica {replica}: {round(100 * rate, 2)}%"
+                  f" of {tried} moves accepted")
+
+        for low, tried in enumerate(self.tried_swaps):
+            rate = self.accepted_swaps[low] / max(tried, 1)
+            print(f"Swap {round(self.temperatures[low], 1)} <->"
+                  f" {round(self.temperatures[low + 1], 1)}:"
+                  f" {round(100 * rate, 2)}% of {tried} swaps accepted")
+
+    def run(self, rounds: Optional[int] = None) -> Optional['Chip']:
+        """
+        Runs parallel tempering for a number of rounds, or until 'ctrl+C'
+        is pressed if no number is given. 'ctrl+C' lets the current round
+        finish. Returns the best chip, or None if no round was finished.
+        """
+
+        random.seed(a=self.seed)
+        replica_count: int = len(self.temperatures)
+        budget = Budget(iterations=rounds)
+
+        # Temperature index -> replica currently at that temperature
+        replica_at: list[int] = list(range(replica_count))
+        costs: list[int] = [0] * replica_count
+        logger: Optional[RunLogger] = None
+        if self.output_filename is not None:
+            logger = RunLogger(self.output_filename, self.log_format)
+        cumulative_duration: float = 0.0
+        round_no: int = 0
+
+        # Start one process per replica, all creating their chip from one
+        # shared copy of the static state
+        connections: list[Connection] = []
+        processes: list[Process] = []
+        stopped: bool = False
+        with SharedChip(Chip(self.chip_no,
+                             f"netlist_{self.netlist_no}.csv")) as shared:
+            try:
+                for replica in range(replica_count):
+                    parent_end, child_end = Pipe()
+                    process = Process(target=run_replica,
+                                      args=(self.chip_no, self.netlist_no,
+                                            self.seed + replica + 1,
+                                            child_end, shared.name))
+                    process.start()
+                    connections.append(parent_end)
+                    processes.append(process)
+
+                start_time: float = time.time()
+                with budget:
+                    while not budget.is_spent(math.inf if self.best is None
+                                              else self.best[0]):
+                        for index, replica in enumerate(replica_at):
+                            connections[replica].send(
+                                (self.temperatures[index],
+                                 self.steps_per_round))
+
+                        for replica, connection in enumerate(connections):
+                            self.collect(replica, connection, costs)
+
+                        self.exchange_replicas(replica_at, costs, round_no)
+
+                        # Log the global best cost of this round
+                        duration: float = time.time() - start_time
+                        cumulative_duration += duration
+                        start_time = time.time()
+                        if logger is not None:
+                            logger.log_row([round_no * self.steps_per_round *
+                                            replica_count, self.best[0],
+                                            self.best[1], self.best[2],
+                                            duration, cumulative_duration])
+                        round_no += 1
+
+                # Stop all replicas, they are all waiting for a new round
+                for connection in connections:
+                    connection.send(None)
+                stopped = True
+            finally:
+                # After an error replicas may be halfway through a round,
+                # so they are stopped hard
+                for process in processes:
+                    if not stopped:
+                        process.terminate()
+                    process.join()
+
+                # Write the remaining buffered chip data
+                if logger is not None:
+                    logger.close()
+
+        self.report()
+        print(f"\nRuntime: {round(cumulative_duration, 3)} seconds.")
+
+        if self.best is None:
+            print("No round was finished.")
+            return None
+
+        # Rebuild the global best chip from its wire paths
+        chip = Chip(self.chip_no, f"netlist_{self.netlist_no}.csv")
+        chip.add_wire_paths(self.best[3])
+        chip.calculate_costs()
+
+        return chip
@@ -0,0 +1,180 @@
+import sys
+import time
+from typing import Optional
+from analysis.save import RunLogger
+from classes.chip import Chip
+from classes.gate import Gate
+from classes.wire import Wire
+from .astar import AstarAlg, Heuristics, WireSegment
+
+sys.path.append("../analysis")
+sys.path.append("../classes")
+sys.path.append("..")
+
+
+class CongestionHeuristics(Heuristics):
+    """ Implements the negotiated congestion costs of the PathFinder
+        algorithm. Instead of a fixed cost of 300, a cell costs
+        (1 + history cost) * (1 + present factor * wires on the cell).
+        The history cost of a cell grows every iteration it is shared,
+        the present factor grows every iteration for all cells.
+    """
+
+    def __init__(self, heuristic: Optional[str] = None,
+                 sorting_mode: Optional[str] = None) -> None:
+        super().__init__(heuristic, sorting_mode)
+        self.history_costs: list[float] = []
+        self.present_factor: float = 0.5
+
+    def create_static_cost_fields(self, chip: "Chip") -> None:
+        """
+        Precomputes the static cost fields and clears the history costs.
+        """
+
+        super().create_static_cost_fields(chip)
+        self.history_costs = [0.0] * chip.grid.cell_count
+
+    def default(self, chip: "Chip", current_segment: "WireSegment",
+                next_segment: "WireSegment",
+                father_coords: tuple[int, int, int]) -> None:
+        """
+        Assigns the negotiated congestion cost of a segment.
+        """
+
+        # Wires already present on the cell
+        occupancy: int = chip.grid.get_wire_count(next_segment.cell)
+
+        next_segment.wire_cost = current_segment.wire_cost +\
+            (1 + self.history_costs[next_segment.cell]) *\
+            (1 + self.present_factor * occupancy)
+
+        # Assign distance cost
+        next_segment.manhattan_cost =\
+            self.estimate_distance(next_segment, father_coords)
+
+        # Assign total cost
+        next_segment.total_cost =\
+            next_segment.wire_cost + next_segment.manhattan_cost
+
+    def update_history_costs(self, chip: "Chip",
+                             history_factor: float) -> None:
+        """
+        Raises the history cost of every cell shared by multiple wires.
+        """
+
+        for cell, count in enumerate(chip.grid.flat_wire_counts.tolist()):
+            if count >= 2:
+                self.history_costs[cell] += history_factor * (count - 1)
+
+
+class PathFinder(AstarAlg):
+    """ Implements negotiated congestion rip-up-and-reroute on top of A*.
+        All wires are routed once, then the wires which share cells are
+        repeatedly ripped up and rerouted under rising congestion costs,
+        until no wires intersect or the iteration or time budget runs out.
+        The cheapest configuration found is kept.
+    """
+
+    heuristics_class: type = CongestionHeuristics
+
+    def __init__(self, chip_no: int, netlist_no: int,
+                 output_filename: Optional[str],
+                 sorting_mode: Optional[str], heuristic: Optional[str],
+                 max_iterations: int = 200, time_budget: float = 300,
+                 present_growth: float = 1.5,
+                 history_factor: float = 1.0,
+                 log_format: str = "csv") -> None:
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        self.present_growth = present_growth
+        self.history_factor = history_factor
+        super().__init__(chip_no, netlist_no, output_filename,
+                         sorting_mode, heuristic, log_format)
+
+    def get_conflicted_wires(self) -> list["Wire"]:
+        """
+        Returns all wires which share at least one cell with another wire.
+        """
+
+        grid = self.chip.grid
+        conflicted_wires: list["Wire"] = []
+
+        for wire in self.chip.wires:
+            for coords in wire.get_path()[1:-1]:
+                if grid.get_wire_count(grid.encode(coords)) >= 2:
+                    conflicted_wires.append(wire)
+                    break
+
+        return conflicted_wires
+
+    def reroute_wire(self, wire: "Wire") -> None:
+        """
+        Rips up a wire and routes it again under the current costs.
+        """
+
+        self.chip.lift_wire(wire)
+        wire.set_path(self.draw_wire(wire.mother, wire.father))
+
+    def run(self) -> None:
+        """
+        Lay all wires, then negotiate congestion and return chip.
+        """
+
+        # Start timer
+        start_time: float = time.time()
+
+        # Get sorted connections and route every wire once
+        sorted_connections: list[tuple["Gate", "Gate", int]] =\
+            self.heuristic.sort_desired_connections(self.chip)
+        for mother, father, _ in sorted_connections:
+            self.chip.add_wire(self.create_wire(mother, father))
+
+        best_cost: int = self.chip.calculate_costs()
+        best_paths: list[list[tuple[int, int, int]]] =\
+            [wire.get_path() for wire in self.chip.wires]
+
+        for iteration in range(1, self.max_iterations + 1):
+            conflicted_wires: list["Wire"] = self.get_conflicted_wires()
+            print(f"Iteration {iteration}: {len(conflicted_wires)}"
+                  f" conflicted wires, cost {self.chip.cost}")
+
+            # Stop when no wires intersect or the time budget ran out
+            if not conflicted_wires or\
+                    time.time() - start_time > self.time_budget:
+                break
+
+            # Make shared cells more expensive, now and in the future
+            self.heuristic.update_history_costs(self.chip,
+                                                self.history_factor)
+            self.heuristic.present_factor *= self.present_growth
+
+            for wire in conflicted_wires:
+                self.reroute_wire(wire)
+
+            # Remember the cheapest configuration
+            if self.chip.calculate_costs() < best_cost:
+                best_cost = self.chip.cost
+                best_paths = [wire.get_path() for wire in self.chip.wires]
+
+        # Restore the cheapest configuration
+        for wire, path in zip(self.chip.wires, best_paths):
+            self.chip.lift_wire(wire)
+            self.chip.place_wire(wire, path)
+
+        # Determine duration of algorithm
+        total_time: float = time.time() - start_time
+        print(f"Runtime: {round(total_time, 2)} seconds.")
+
+        # Assing duration to chip
+        self.chip.iteration_duration = total_time
+        self.chip.cumulative_duration += self.chip.iteration_duration
+
+        # Determine chip cost
+        self.chip.calculate_costs()
+        print(f"Cost: {self.chip.cost},"
+              f" intersections: {self.chip.intersectioncount}")
+
+        # Save relevant chip data to file
+        if self.output_filename is not None:
+            with RunLogger(self.output_filename, self.log_format) as logger:
+                logger.log(self.chip)
@@ -0,0 +1,246 @@
+import contextlib
+import io
+import math
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Optional
+from analysis.save import RunLogger
+from classes.chip import Chip
+from classes.gate import Gate
+from classes.shared_chip import SharedChip, attach_shared_chip
+from .astar import AstarAlg
+from .bidirectional import BidirectionalAstar
+from .lee import LeeAlg
+
+sys.path.append("../analysis")
+sys.path.append("../classes")
+sys.path.append("..")
+
+# Routers which lay one wire at a time, and so can be stopped in between
+ROUTERS: dict[str, type] = {"astar": AstarAlg,
+                            "bidirectional": BidirectionalAstar,
+                            "lee": LeeAlg}
+
+SORTING_MODES: list[Optional[str]] = [None, "ascending", "descending"]
+HEURISTICS: list[Optional[str]] = [None, "avoid_gates", "avoid_low", "all"]
+
+# Shared state of a worker process, set by init_worker
+best_cost_so_far: Any = None
+deadline: float = math.inf
+
+
+def init_worker(shared_best_cost: Any, end_time: float, chip_no: int,
+                shared_name: str) -> None:
+    """
+    Stores the shared best cost and the deadline in a worker process, and
+    attaches to the shared chip.
+    """
+
+    global best_cost_so_far, deadline
+
+    # Interruptions are handled by the coordinating process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    best_cost_so_far = shared_best_cost
+    deadline = end_time
+    attach_shared_chip(chip_no, shared_name)
+
+
+class PortfolioRouting:
+    """ Routes the connections of an A* router in a given order, shuffled
+        if an order seed is given, and stops as soon as the cost of the
+        wires laid so far reaches the best cost of the portfolio or the
+        deadline has passed. Laying a wire never lowers the cost, so such
+        a run can never become the best one.
+    """
+
+    def __init__(self, chip_no: int, netlist_no: int,
+                 output_filename: Optional[str],
+                 sorting_mode: Optional[str], heuristic: Optional[str],
+                 order_seed: Optional[int] = None) -> None:
+        self.order_seed = order_seed
+        self.aborted: bool = False
+        super().__init__(chip_no, netlist_no, output_filename,
+                         sorting_mode, heuristic)
+
+    def run(self) -> None:
+        """
+        Lay all wires unless the run is aborted.
+        """
+
+        connections: list[tuple["Gate", "Gate", int]] =\
+            self.heuristic.sort_desired_connections(self.chip)
+        if self.order_seed is not None:
+            random.Random(self.order_seed).shuffle(connections)
+
+        for mother, father, _ in connections:
+            if time.time() > deadline or\
+                    self.chip.calculate_costs() >= best_cost_so_far.value:
+                self.aborted = True
+                return
+
+            self.chip.add_wire(self.create_wire(mother, father))
+
+        self.chip.calculate_costs()
+
+
+def route_configuration(chip_no: int, netlist_no: int,
+                        configuration: dict[str, Any]) ->\
+        Optional[tuple[int, int, int, list[list[tuple[int, int, int]]]]]:
+    """
+    Worker for the portfolio. Routes a netlist with one configuration and
+    returns the cost, wire count, intersection count and wire paths of
+    the chip, in netlist order, or None if the run was aborted or a wire
+    could not be laid.
+    """
+
+    router: type = type(f"Portfolio{configuration['router']}",
+                        (PortfolioRouting, ROUTERS[configuration["router"]]),
+                        {})
+
+    # Silence the progress output of the router
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            routing = router(chip_no, netlist_no, None,
+                             configuration["sorting_mode"],
+                             configuration["heuristic"],
+                             configuration["order_seed"])
+        except SystemExit:
+            return None
+
+    if routing.aborted:
+        return None
+
+    # Share the cost if it is the best one so far
+    chip: "Chip" = routing.chip
+    with best_cost_so_far.get_lock():
+        if chip.cost < best_cost_so_far.value:
+            best_cost_so_far.value = chip.cost
+
+    return (chip.cost, chip.wirecount, chip.intersectioncount,
+            chip.get_wire_paths())
+
+
+class Portfolio:
+    """
+    Implements a portfolio solver: many router, sorting mode and heuristic
+    combinations, and random connection orders, race each other in a
+    process pool. The best cost found so far is shared, so workers stop
+    runs which can no longer beat it. Returns the best chip found within
+    the wall-clock budget.
+    """
+
+    def __init__(self, chip_no: int, netlist_no: int, output_filename: str,
+                 workers: Optional[int] = None, time_budget: float = 60,
+                 permutations: int = 24,
+                 routers: Optional[list[str]] = None, seed: int = 1,
+                 log_format: str = "csv"):
+        self.chip_no = chip_no
+        self.netlist_no = netlist_no
+        self.output_filename = output_filename
+        self.workers = workers or os.cpu_count() or 1
+        self.time_budget = time_budget
+        self.log_format = log_format
+
+        # Every fixed combination first, then the random connection orders
+        self.configurations: list[dict[str, Any]] = []
+        for router in routers or list(ROUTERS):
+            for sorting_mode in SORTING_MODES:
+                for heuristic in HEURISTICS:
+                    self.configurations.append({"router": router,
+                                                "sorting_mode": sorting_mode,
+                                                "heuristic": heuristic,
+                                                "order_seed": None})
+            for index in range(permutations):
+                self.configurations.append({"router": router,
+                                            "sorting_mode": None,
+                                            "heuristic":
+                                                HEURISTICS[index %
+                                                           len(HEURISTICS)],
+                                            "order_seed": seed + index})
+
+    def run(self) -> Optional['Chip']:
+        """
+        Runs all configurations until they are done or the budget is spent.
+        Returns the best chip, or None if no configuration finished.
+        """
+
+        context = multiprocessing.get_context()
+        shared_best_cost = context.Value("d", math.inf)
+        start_time: float = time.time()
+        end_time: float = start_time + self.time_budget
+
+        best: Optional[tuple[int, int, int,
+                             list[list[tuple[int, int, int]]]]] = None
+        best_configuration: Optional[dict[str, Any]] = None
+        aborted: int = 0
+        logger = RunLogger(self.output_filename, self.log_format)
+        iteration: int = 0
+        previous_time: float = start_time
+
+        # Workers create their chips from one shared copy of the static
+        # state
+        with SharedChip(Chip(self.chip_no,
+                             f"netlist_{self.netlist_no}.csv")) as shared:
+            pool = ProcessPoolExecutor(max_workers=self.workers,
+                                       mp_context=context,
+                                       initializer=init_worker,
+                                       initargs=(shared_best_cost, end_time,
+                                                 self.chip_no, shared.name))
+            futures = {pool.submit(route_configuration, self.chip_no,
+                                   self.netlist_no, configuration):
+                       configuration
+                       for configuration in self.configurations}
+            pending = set(futures)
+
+            try:
+                while pending and time.time() < end_time:
+                    done, pending = wait(pending,
+                                         timeout=end_time - time.time(),
+                                         return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        result = future.result()
+                        if result is None:
+                            aborted += 1
+                            continue
+
+                        # Log every finished configuration
+                        duration: float = time.time() - previous_time
+                        previous_time = time.time()
+                        logger.log_row([iteration, result[0], result[1],
+                                        result[2], duration,
+                                        previous_time - start_time])
+                        iteration += 1
+
+                        if best is None or result[0] < best[0]:
+                            best = result
+                            best_configuration = futures[future]
+                            print(f"Cost {best[0]}: {best_configuration}")
+            except KeyboardInterrupt:
+                pass
+            finally:
+                # Skip the configurations which did not start, and let
+                # running ones stop at their next wire
+                shared_best_cost.value = -math.inf
+                pool.shutdown(cancel_futures=True)
+                logger.close()
+
+        print(f"\nFinished {iteration} of {len(self.configurations)}"
+              f" configurations, {aborted} aborted.")
+        print(f"Runtime: {round(time.time() - start_time, 3)} seconds.")
+
+        if best is None:
+            print("No configuration finished within the budget.")
+            return None
+
+        # Rebuild the best chip from its wire paths
+        chip = Chip(self.chip_no, f"netlist_{self.netlist_no}.csv")
+        chip.add_wire_paths(best[3])
+        chip.calculate_costs()
+
+        return chip
@@ -1,97 +1,81 @@
 import sys
+import os
+import math
 import random
-import copy
 import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
 from classes.grid import Grid
 from classes.wire import Wire
 from classes.chip import Chip
-from analysis.save import save_to_file
+from classes.shared_chip import SharedChip, attach_shared_chip
+from analysis.save import RunLogger
+from .budget import Budget
 sys.path.append("../analysis")
 sys.path.append("../classes")
 
 random.seed(a=1)
-max_tries: int = 1000
-counter: int = 0
-tries_counter: int = 0
 
 
-def is_move_valid(wire: 'Wire', grid: 'Grid',
-                  desired_position: tuple[int, int, int]) -> bool:
+def is_move_valid(wire: 'Wire', grid: 'Grid', desired_cell: int) -> bool:
     """
     Checks if a given move is a valid move.
     """
 
-    global counter
-    global tries_counter
+    # A wire may not cross itself or enter a foreign gate
+    if wire.has_visited(grid.decode(desired_cell)):
+        return False
+    elif grid.check_for_illegal_gate(desired_cell, wire.father):
+        return False
 
-    grid_upperbounds = grid.get_grid_size()
+    return True
 
-    # Check if move is out of bounds
-    if desired_position[0] > grid_upperbounds[0] or\
-       desired_position[1] > grid_upperbounds[1] or\
-       desired_position[2] > grid_upperbounds[2] or\
-       desired_position[0] < 0 or\
-       desired_position[1] < 0 or\
-       desired_position[2] < 0:
-        counter += 1
-        tries_counter += 1
-        return False
 
-    foreign_gate: bool =\
-        grid.check_for_illegal_gate(desired_position, wire.father)
+def get_legal_directions(wire: 'Wire', grid: 'Grid',
+                         current_cell: int) -> list[int]:
+    """
+    Returns the neighbouring cells a wire can legally move to.
+    """
 
-    # Check for all illegal moves
-    if desired_position in wire.path:
-        counter += 1
-        tries_counter += 1
-        return False
-    elif foreign_gate:
-        counter += 1
-        tries_counter += 1
-        return False
-    else:
-        counter = 0
-        return True
+    # Neighbour table only holds moves that stay within the grid
+    return [cell for cell in grid.neighbours[current_cell]
+            if is_move_valid(wire, grid, cell)]
 
 
-def get_random_direction(wire: 'Wire') -> tuple[int, int, int]:
+def get_random_direction(wire: 'Wire', grid: 'Grid',
+                         current_cell: int) -> Optional[int]:
     """
-    Defines a random direction for a wire to base its next move on.
+    Defines a random legal direction for a wire to base its next move on,
+    or None if the wire has walked into a dead end.
     """
 
-    current_position = wire.get_current_position()
-    current_position_x = current_position[0]
-    current_position_y = current_position[1]
-    current_position_z = current_position[2]
+    legal_directions: list[int] =\
+        get_legal_directions(wire, grid, current_cell)
 
-    possible_directions: list[tuple[int, int, int]] =\
-        [(current_position_x + 1, current_position_y, current_position_z),
-         (current_position_x - 1, current_position_y, current_position_z),
-         (current_position_x, current_position_y + 1, current_position_z),
-         (current_position_x, current_position_y - 1, current_position_z),
-         (current_position_x, current_position_y, current_position_z + 1),
-         (current_position_x, current_position_y, current_position_z - 1)]
+    if not legal_directions:
+        return None
 
-    random_direction: tuple[int, int, int] = random.choice(possible_directions)
-
-    return random_direction
+    return random.choice(legal_directions)
 
 
 def lay_wire(wire: 'Wire', grid: 'Grid') -> None:
     """
-    Inserts wires into the 3D grid.
+    Inserts wires into the 3D grid, stops at the father gate or at a
+    dead end.
     """
 
-    global counter
-    counter = 0
+    current_cell: int = grid.encode(wire.get_current_position())
+    father_cell: int = grid.encode(wire.father.get_coords())
+
+    while (current_cell != father_cell):
+        random_direction = get_random_direction(wire, grid, current_cell)
+        if (random_direction is None):
+            return
 
-    while (counter <= max_tries and not wire.check_for_father()):
-        random_direction = get_random_direction(wire)
-        if (is_move_valid(wire, grid, random_direction)):
-            wire.add_unit(random_direction)
-            if (random_direction != wire.father.get_coords()):
-                grid.values[random_direction[2]][random_direction[1]]\
-                           [random_direction[0]] -= 1
+        wire.add_unit(grid.decode(random_direction))
+        current_cell = random_direction
+        if (random_direction != father_cell):
+            grid.add_wire_unit(random_direction)
 
 
 def random_reassign_wire(new_wire: "Wire", grid: "Grid"):
@@ -101,77 +85,192 @@ def random_reassign_wire(new_wire: "Wire", grid: "Grid"):
 
     # Trace back wire and remove
     for unit in range(len(new_wire.get_path()) - 1):
-        coords = new_wire.pop_unit()
+        cell = grid.encode(new_wire.pop_unit())
 
         # Reset grid on traced back route
-        if grid.values[coords[2]][coords[1]][coords[0]] !=\
-           new_wire.father.get_id():
-            grid.values[coords[2]][coords[1]][coords[0]] += 1
+        if grid.get_gate_id(cell) != new_wire.father.get_id():
+            grid.remove_wire_unit(cell)
 
     # Start a new wire
     lay_wire(new_wire, grid)
 
 
-def run_random(chip_no: int, netlist_no: int, output_filename: str) -> 'Chip':
+def lay_valid_wire(wire: "Wire", grid: "Grid") -> None:
+    """
+    Randomly lays a wire until it has found its father gate.
+    """
+
+    lay_wire(wire, grid)
+
+    # Reset wire and its path on the grid
+    # and find new path until wire has found father
+    while (wire.get_current_position() != wire.father.get_coords()):
+        random_reassign_wire(wire, grid)
+
+
+def create_random_chip(chip_no: int, netlist_no: int) -> 'Chip':
+    """
+    Creates a chip and randomly lays all its wires.
+    """
+
+    chip = Chip(chip_no, f"netlist_{netlist_no}.csv")
+
+    # Loop through all mother gates and lay wires to father
+    for mother, father in chip.get_connections():
+        new_wire = Wire(mother, father)
+        chip.add_wire(new_wire)
+        lay_valid_wire(new_wire, chip.grid)
+
+    return chip
+
+
+def sample_random_chips(chip_no: int, netlist_no: int, iterations: int,
+                        seed: int) -> tuple[int,
+                                            list[list[tuple[int, int, int]]],
+                                            list[list[Union[int, float]]]]:
     """
-    Runs random algorithm.
+    Worker for the parallel random algorithm. Creates a number of random
+    chips with its own seeded random stream and returns the cost and
+    wire paths of the best chip and the data of every chip.
     """
 
+    random.seed(a=seed)
+
+    best_cost: int = -1
+    best_paths: list[list[tuple[int, int, int]]] = []
+    results: list[list[Union[int, float]]] = []
+
+    for _ in range(iterations):
+        start_time: float = time.time()
+        chip = create_random_chip(chip_no, netlist_no)
+        total_costs: int = chip.calculate_costs()
+
+        # Remember the paths of the cheapest chip configuration only
+        if (best_cost == -1 or total_costs < best_cost):
+            best_cost = total_costs
+            best_paths = [wire.get_path() for wire in chip.wires]
+
+        results.append([total_costs, chip.wirecount, chip.intersectioncount,
+                        time.time() - start_time])
+
+    return best_cost, best_paths, results
+
+
+def run_random_parallel(chip_no: int, netlist_no: int, output_filename: str,
+                        workers: Optional[int] = None,
+                        iterations: int = 1000, seed: int = 1,
+                        log_format: str = "csv") -> 'Chip':
+    """
+    Runs the random algorithm over a pool of worker processes and
+    reduces their results to the cheapest chip.
+    """
+
+    if iterations < 1:
+        raise ValueError("The random algorithm needs at least one iteration")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # Divide the iterations over the workers
+    share, remainder = divmod(iterations, workers)
+    worker_iterations: list[int] =\
+        [share + (1 if index < remainder else 0) for index in range(workers)]
+
+    start_time: float = time.time()
+
+    # Workers create their chips from one shared copy of the static state
+    with SharedChip(Chip(chip_no, f"netlist_{netlist_no}.csv")) as shared,\
+            ProcessPoolExecutor(max_workers=workers,
+                                initializer=attach_shared_chip,
+                                initargs=(chip_no, shared.name)) as pool:
+        futures = [pool.submit(sample_random_chips, chip_no, netlist_no,
+                               amount, seed + index)
+                   for index, amount in enumerate(worker_iterations)
+                   if amount > 0]
+        samples = [future.result() for future in futures]
+
+    # Rebuild the cheapest chip from its wire paths
+    _, best_paths, _ = min(samples, key=lambda sample: sample[0])
+    best_chip = Chip(chip_no, f"netlist_{netlist_no}.csv")
+    best_chip.add_wire_paths(best_paths)
+    best_chip.calculate_costs()
+
+    # Merge the cost distribution of all workers and save it to file
+    iteration: int = 0
+    cumulative_duration: float = 0.0
+    with RunLogger(output_filename, log_format) as logger:
+        for _, _, results in samples:
+            for cost, wirecount, intersectioncount, duration in results:
+                cumulative_duration += duration
+                logger.log_row([iteration, cost, wirecount,
+                                intersectioncount, duration,
+                                cumulative_duration])
+                iteration += 1
+
+    print(f"\nRuntime: {round(time.time() - start_time, 3)} seconds.")
+    return best_chip
+
+
+def run_random(chip_no: int, netlist_no: int, output_filename: str,
+               log_format: str = "csv",
+               budget: Optional['Budget'] = None) -> Optional['Chip']:
+    """
+    Runs random algorithm until the budget is spent, or until 'ctrl+C'
+    without a budget. Returns the cheapest chip, or None if the budget
+    allowed no chip at all.
+    """
+
+    if budget is None:
+        budget = Budget()
+
     iteration = 0
     cumulative_duration: float = 0.0
+    best_chip: Optional['Chip'] = None
+    best_cost: float = math.inf
+
+    logger = RunLogger(output_filename, log_format)
 
     # Start timer
     start_time: float = time.time()
 
-    while (True):
-        try:
-            chip = Chip(chip_no, f"netlist_{netlist_no}.csv")
-
-            # Loop through all mother gates and lay wires to father
-            for mother in chip.gates.values():
-                for father in mother.get_destinations():
-                    new_wire = Wire(mother, father)
-                    chip.add_wire(new_wire)
-                    lay_wire(new_wire, chip.grid)
-
-                    # Reset wire and its path on the grid
-                    # and find new path until wire has found father
-                    while (new_wire.get_current_position() !=
-                           new_wire.father.get_coords()):
-                        random_reassign_wire(new_wire, chip.grid)
-
-            # Calculate total cost of chip
-            total_costs = chip.calculate_costs()
-
-            # Remeber cheapest chip configuration
-            if (iteration == 0):
-                best_chip = copy.deepcopy(chip)
-            else:
-                if (total_costs < best_chip.calculate_costs()):
-                    best_chip = copy.deepcopy(chip)
-
-            # Count chip iteration number
-            chip.iteration = iteration
-            iteration += 1
-
-            # Get time for completed iteration
-            completed_iteration_time = time.time()
-
-            # Calculate duration of iteration
-            chip.iteration_duration = completed_iteration_time - start_time
-
-            # Update cumulative iteration duration
-            cumulative_duration += chip.iteration_duration
-            chip.cumulative_duration = cumulative_duration
-
-            # Reset timer
-            start_time = time.time()
-
-            # Save relevant chip data to file
-            save_to_file(chip, output_filename)
-
-        except KeyboardInterrupt:
-            break
-        
-    print(f"\nRuntime: {round(cumulative_duration, 3)} seconds.")
+    try:
+        with budget:
+            while not budget.is_spent(best_cost):
+                chip = create_random_chip(chip_no, netlist_no)
+
+                # Calculate total cost of chip
+                total_costs = chip.calculate_costs()
+
+                # Remember cheapest chip configuration, every chip is new
+                # so it does not have to be copied
+                if (total_costs < best_cost):
+                    best_chip = chip
+                    best_cost = total_costs
+
+                # Count chip iteration number
+                chip.iteration = iteration
+                iteration += 1
+
+                # Get time for completed iteration
+                completed_iteration_time = time.time()
+
+                # Calculate duration of iteration
+                chip.iteration_duration =\
+                    completed_iteration_time - start_time
+
+                # Update cumulative iteration duration
+                cumulative_duration += chip.iteration_duration
+                chip.cumulative_duration = cumulative_duration
+
+                # Reset timer
+                start_time = time.time()
+
+                # Save relevant chip data to file
+                logger.log(chip)
+    finally:
+        # Write the remaining buffered chip data
+        logger.close()
+
+    print(f"\nStopped: {budget.stop_reason}.")
+    print(f"Runtime: {round(cumulative_duration, 3)} seconds.")
     return best_chip
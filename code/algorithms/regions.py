@@ -0,0 +1,356 @@
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import numpy as np
+from analysis.save import RunLogger
+from classes.shared_chip import SharedChip, attach_shared_chip
+from classes.gate import Gate
+from classes.wire import Wire
+from .astar import AstarAlg, WireSegment
+
+sys.path.append("../analysis")
+sys.path.append("../classes")
+sys.path.append("..")
+
+# Cells a wire may stray beside the bounding box of its gates
+MARGIN: int = 2
+
+
+def get_bounding_box(mother: "Gate", father: "Gate", margin: int,
+                     grid_size: tuple[int, int, int]) ->\
+        tuple[int, int, int, int]:
+    """
+    Returns the lowest x, lowest y, highest x and highest y of the area
+    around two gates, widened by the margin and clipped to the grid.
+    """
+
+    return (max(min(mother.get_x(), father.get_x()) - margin, 0),
+            max(min(mother.get_y(), father.get_y()) - margin, 0),
+            min(max(mother.get_x(), father.get_x()) + margin, grid_size[0]),
+            min(max(mother.get_y(), father.get_y()) + margin, grid_size[1]))
+
+
+def group_overlapping(boxes: list[tuple[int, int, int, int]]) ->\
+        list[list[int]]:
+    """
+    Returns the indices of the boxes in groups, such that boxes overlap
+    with, or through other boxes are linked to, only boxes of their own
+    group.
+    """
+
+    parents: list[int] = list(range(len(boxes)))
+
+    def find(index: int) -> int:
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    # Sweep along x, only boxes which are still open can overlap
+    open_boxes: list[int] = []
+    for index in sorted(range(len(boxes)), key=lambda index: boxes[index][0]):
+        low_x, low_y, _, high_y = boxes[index]
+        open_boxes = [other for other in open_boxes
+                      if boxes[other][2] >= low_x]
+
+        for other in open_boxes:
+            if boxes[other][1] <= high_y and low_y <= boxes[other][3]:
+                parents[find(other)] = find(index)
+        open_boxes.append(index)
+
+    groups: dict[int, list[int]] = {}
+    for index in range(len(boxes)):
+        groups.setdefault(find(index), []).append(index)
+
+    return list(groups.values())
+
+
+def merge_groups(groups: list[tuple[tuple[int, int, int, int], list[int]]])\
+        -> list[tuple[tuple[int, int, int, int], list[int]]]:
+    """
+    Merges groups until their windows, the area around all their bounding
+    boxes, do not overlap.
+    """
+
+    # Merging groups widens their windows, which may then overlap others
+    while True:
+        merged: list[list[int]] =\
+            group_overlapping([window for window, _ in groups])
+        if len(merged) == len(groups):
+            return groups
+
+        groups = [((min(groups[index][0][0] for index in members),
+                    min(groups[index][0][1] for index in members),
+                    max(groups[index][0][2] for index in members),
+                    max(groups[index][0][3] for index in members)),
+                   sorted(connection for index in members
+                          for connection in groups[index][1]))
+                  for members in merged]
+
+
+def partition_connections(connections: list[tuple["Gate", "Gate", int]],
+                          margin: int, grid_size: tuple[int, int, int],
+                          regions: int) ->\
+        tuple[list[tuple[tuple[int, int, int, int], list[int]]], list[int]]:
+    """
+    Splits the connections into groups whose windows do not overlap.
+    Groups of connections which overlap are kept together, but as long as
+    there are fewer groups than regions, the largest group is cut in two
+    across the longest side of its window. Returns the window and the
+    indices of the connections of every group, and the indices of the
+    connections which cross a cut.
+    """
+
+    boxes: list[tuple[int, int, int, int]] =\
+        [get_bounding_box(mother, father, margin, grid_size)
+         for mother, father, _ in connections]
+    groups: list[tuple[tuple[int, int, int, int], list[int]]] =\
+        merge_groups([(box, [index]) for index, box in enumerate(boxes)])
+    crossing: list[int] = []
+
+    # Groups which could not be cut any further
+    uncut: list[tuple[tuple[int, int, int, int], list[int]]] = []
+
+    while groups and len(groups) + len(uncut) < regions:
+        groups.sort(key=lambda group: len(group[1]))
+        window, members = groups.pop()
+
+        # Cut at the median centre along the longest side of the window
+        axis: int = 0 if window[2] - window[0] >= window[3] - window[1]\
+            else 1
+        centres: list[int] = sorted(boxes[index][axis] +
+                                    boxes[index][axis + 2]
+                                    for index in members)
+        cut: int = (centres[len(centres) // 2] + 1) // 2
+
+        sides: tuple[list[int], list[int], list[int]] = ([], [], [])
+        for index in members:
+            if boxes[index][axis + 2] < cut:
+                sides[0].append(index)
+            elif boxes[index][axis] >= cut:
+                sides[1].append(index)
+            else:
+                sides[2].append(index)
+
+        if not sides[0] or not sides[1]:
+            uncut.append((window, members))
+            continue
+
+        crossing += sides[2]
+        for side in sides[:2]:
+            groups += merge_groups([(boxes[index], [index])
+                                    for index in side])
+
+    return groups + uncut, sorted(crossing)
+
+
+class WindowRouting(AstarAlg):
+    """ Routes a given list of connections with A*, without leaving a
+        window of the grid. Connections which cannot be routed inside the
+        window are left out.
+    """
+
+    def __init__(self, chip_no: int, netlist_no: int,
+                 sorting_mode: Optional[str], heuristic: Optional[str],
+                 window: tuple[int, int, int, int],
+                 connection_ids: list[tuple[int, int]]) -> None:
+        self.window = window
+        self.connection_ids = connection_ids
+        self.paths: list[Optional[list[tuple[int, int, int]]]] = []
+        super().__init__(chip_no, netlist_no, None, sorting_mode, heuristic)
+
+    def get_possible_directions(self, current_segment: "WireSegment",
+                                father_cell: int) -> list[int]:
+        """
+        Returns the cells inside the window a wire can move to from a wire
+        segment's cell.
+        """
+
+        possible_directions: list[int] =\
+            super().get_possible_directions(current_segment, father_cell)
+        if self.in_window is None:
+            return possible_directions
+
+        return [cell for cell in possible_directions if self.in_window[cell]]
+
+    def run(self) -> None:
+        """
+        Lay the wires of the given connections, in the given order.
+        """
+
+        # Mark the cells of the window, on every layer, unless it is the
+        # whole grid
+        grid_x, grid_y, _ = self.chip.grid.get_grid_size()
+        low_x, low_y, high_x, high_y = self.window
+        self.in_window: Optional[list[bool]] = None
+        if self.window != (0, 0, grid_x, grid_y):
+            in_window = np.zeros(self.chip.grid.shape, dtype=bool)
+            in_window[:, low_y:high_y + 1, low_x:high_x + 1] = True
+            self.in_window = in_window.reshape(-1).tolist()
+
+        for mother_id, father_id in self.connection_ids:
+            mother: "Gate" = self.chip.gates[str(mother_id)]
+            father: "Gate" = self.chip.gates[str(father_id)]
+
+            # Leave the connection to the serial pass if it does not fit
+            try:
+                self.paths.append(self.draw_wire(mother, father))
+            except SystemExit:
+                self.paths.append(None)
+
+
+def route_region(chip_no: int, netlist_no: int, sorting_mode: Optional[str],
+                 heuristic: Optional[str], window: tuple[int, int, int, int],
+                 connection_ids: list[tuple[int, int]]) ->\
+        tuple[list[Optional[list[tuple[int, int, int]]]], int]:
+    """
+    Worker for the region router. Routes the connections of one group
+    inside its window and returns their paths, None for connections which
+    did not fit, and the number of expanded segments.
+    """
+
+    # Silence the progress output of the router
+    with contextlib.redirect_stdout(io.StringIO()):
+        routing = WindowRouting(chip_no, netlist_no, sorting_mode,
+                                heuristic, window, connection_ids)
+
+    return routing.paths, routing.nodes_expanded
+
+
+class RegionPartitionedAstar(AstarAlg):
+    """ Implements A* over regions of the chip. Connections are grouped so
+        that the windows around the groups do not overlap, large groups are
+        cut until there is a region per worker, the groups are routed at the
+        same time in worker processes, each inside its own window. Wires of
+        different groups never share a cell. The wires are then laid in the
+        sorted order, and connections which cross a cut, did not fit in
+        their window or would run through such a serial wire are routed on
+        the whole chip in their turn. When most connections cross a cut,
+        all of them are routed one after another like plain A*.
+    """
+
+    def __init__(self, chip_no: int, netlist_no: int,
+                 output_filename: Optional[str],
+                 sorting_mode: Optional[str], heuristic: Optional[str],
+                 workers: Optional[int] = None,
+                 regions: Optional[int] = None,
+                 margin: int = MARGIN, log_format: str = "csv") -> None:
+        self.chip_no = chip_no
+        self.netlist_no = netlist_no
+        self.sorting_mode = sorting_mode
+        self.heuristic_name = heuristic
+        self.workers = workers or os.cpu_count() or 1
+        self.regions = regions or self.workers
+        self.margin = margin
+        super().__init__(chip_no, netlist_no, output_filename,
+                         sorting_mode, heuristic, log_format)
+
+    def route_groups(self, connections: list[tuple["Gate", "Gate", int]],
+                     groups: list[tuple[tuple[int, int, int, int],
+                                        list[int]]]) ->\
+            list[Optional[list[tuple[int, int, int]]]]:
+        """
+        Routes every group inside its window, in worker processes if there
+        is more than one worker, and returns the path per connection.
+        """
+
+        tasks: list[tuple] = [(self.chip_no, self.netlist_no,
+                               self.sorting_mode, self.heuristic_name,
+                               window,
+                               [(connections[index][0].get_id(),
+                                 connections[index][1].get_id())
+                                for index in members])
+                              for window, members in groups]
+
+        if self.workers == 1 or len(groups) == 1:
+            results = [route_region(*task) for task in tasks]
+        else:
+            with SharedChip(self.chip) as shared,\
+                    ProcessPoolExecutor(max_workers=self.workers,
+                                        initializer=attach_shared_chip,
+                                        initargs=(self.chip_no,
+                                                  shared.name)) as pool:
+                futures = [pool.submit(route_region, *task) for task in tasks]
+                results = [future.result() for future in futures]
+
+        paths: list[Optional[list[tuple[int, int, int]]]] =\
+            [None] * len(connections)
+        for (_, members), (group_paths, nodes_expanded) in\
+                zip(groups, results):
+            self.nodes_expanded += nodes_expanded
+            for index, path in zip(members, group_paths):
+                paths[index] = path
+
+        return paths
+
+    def run(self) -> None:
+        """
+        Lay all wires, region by region, and return chip.
+        """
+
+        # Start timer
+        start_time: float = time.time()
+
+        connections: list[tuple["Gate", "Gate", int]] =\
+            self.heuristic.sort_desired_connections(self.chip)
+        groups, crossing =\
+            partition_connections(connections, self.margin,
+                                  self.chip.grid.get_grid_size(),
+                                  self.regions)
+
+        # Route one after another with plain A* when most connections
+        # would be left to the serial pass anyway, as routing the few
+        # others first gains no time and makes the serial wires costlier
+        if len(groups) < 2 or 2 * len(crossing) > len(connections):
+            print(f"{len(crossing)} of {len(connections)} connections cross"
+                  f" a cut, routing all of them with plain A*.")
+            super().run()
+            return
+
+        paths: list[Optional[list[tuple[int, int, int]]]] =\
+            self.route_groups(connections, groups)
+
+        # Lay the wires in the sorted order, merging the wires of all
+        # regions and routing the connections which cross a cut or did not
+        # fit on the whole chip, around the wires laid before them. Region
+        # wires were routed without the serial wires, so those which run
+        # through a serial wire are routed again as well
+        grid = self.chip.grid
+        serial_cells: set[int] = set()
+        unrouted: int = 0
+        for (mother, father, _), path in zip(connections, paths):
+            if path is not None and\
+                    serial_cells.isdisjoint(grid.encode(coordinate)
+                                            for coordinate in path[1:-1]):
+                new_wire: "Wire" = Wire(mother, father)
+                self.chip.add_wire(new_wire)
+                self.chip.place_wire(new_wire, path)
+            else:
+                new_wire = self.create_wire(mother, father)
+                self.chip.add_wire(new_wire)
+                serial_cells.update(grid.encode(coordinate) for coordinate
+                                    in new_wire.get_path()[1:-1])
+                unrouted += 1
+
+        # Determine duration of algorithm
+        total_time: float = time.time() - start_time
+        print(f"Runtime: {round(total_time, 2)} seconds.")
+        print(f"Routed {len(connections)} connections in {len(groups)}"
+              f" regions, {unrouted} in the serial pass"
+              f" ({len(crossing)} crossing a cut).")
+
+        # Assing duration to chip
+        self.chip.iteration_duration = total_time
+        self.chip.cumulative_duration += self.chip.iteration_duration
+
+        # Determine chip cost
+        self.chip.calculate_costs()
+
+        # Save relevant chip data to file
+        if self.output_filename is not None:
+            with RunLogger(self.output_filename, self.log_format) as logger:
+                logger.log(self.chip)
@@ -1,12 +1,14 @@
-import copy
 import math
 import random
 import sys
 import time
-from analysis.save import save_to_file
+from typing import Any, Callable, Optional
 from classes.chip import Chip
+from classes.grid import Grid
+from classes.wire import Wire
+from .budget import Budget
 from .hill_climber import HillClimber
-from .random_alg import random_reassign_wire
+from .random_alg import lay_valid_wire
 
 sys.path.append("../analysis")
 sys.path.append("../classes")
@@ -22,15 +24,24 @@ class SimulatedAnnealing(HillClimber):
     """
 
     def __init__(self, chip_no: int, netlist_no: int,
-                 output_filename: str, temp: int = 3000000):
+                 output_filename: str, temp: int = 3000000,
+                 log_format: str = "csv",
+                 router: Callable[['Wire', 'Grid'], None] = lay_valid_wire,
+                 checkpoint_interval: Optional[float] = None,
+                 move_selection: str = "cycle"):
         # Use init of hill_climber class
-        super().__init__(chip_no, netlist_no, output_filename)
+        super().__init__(chip_no, netlist_no, output_filename, log_format,
+                         router, checkpoint_interval, move_selection)
 
         # Starting and current temperature
         self.start_temp = temp
         self.current_temp = temp
         self.amount_of_tries: int = 10000
 
+        # Cost and paths of the cheapest chip configuration so far
+        self.best_cost: int = 0
+        self.best_paths: list[list[tuple[int, int, int]]] = []
+
     def cool_down(self, amount_of_tries: int):
         """
         This function will make the temperature gradually cool.
@@ -39,25 +50,17 @@ class SimulatedAnnealing(HillClimber):
 
         self.current_temp -= (self.start_temp / amount_of_tries)
 
-    def check_solution_not_perfect(self, chip_copy: "Chip"):
+    def check_solution_not_perfect(self, difference: int):
         """
-        Checks for a better solution and updates the chip likewise.
+        Checks for a better solution and keeps the moved wire likewise.
         Sometimes accept a worse chip, depending on the current temperature.
         Higher temperatures increase the chances of accepting a worse chip.
         """
 
-        # Cost of the chip after placing a new wire
-        copy_cost = chip_copy.calculate_costs()
-
-        # Update cost of the original chip
-        self.costs = self.chip.calculate_costs()
-
-        # Difference between the new and old chip's costs
-        difference: int = copy_cost - self.costs
-
         # Always update if a better chip is found
         if (difference < 0):
-            self.chip = chip_copy
+            self.chip.commit_move()
+            self.costs = self.chip.calculate_costs()
             return True
 
         # Make sure that when the temperature is below zero,
@@ -83,78 +86,128 @@ class SimulatedAnnealing(HillClimber):
 
         # randomly choose whether we will accept the chip
         if random.random() < chance:
-            self.chip = chip_copy
+            self.chip.commit_move()
+            self.costs = self.chip.calculate_costs()
             return True
 
+        self.chip.undo_move()
         return False
 
-    def run_sim_annealing(self):
+    def get_state(self) -> dict[str, Any]:
         """
-        Runs simulated annealing algorithm.
+        Returns the state a run can be resumed from, with the temperature
+        and the cheapest chip so far.
         """
 
-        # Get one valid solution
-        self.make_random_valid_solution()
-
-        # Update the first score
-        self.chip.calculate_costs()
-
-        # Writing original solved chip data to CSV file
-        save_to_file(self.chip, self.output_filename)
-
-        iteration: int = 0
-
-        # Start timer
-        start_time: float = time.time()
-
-        while (True):
-            try:
-                # Go through all the wires
-                for wire in range(len(self.chip.wires)):
+        state: dict[str, Any] = super().get_state()
+        state.update({"algorithm": "simulatedannealing",
+                      "start_temp": self.start_temp,
+                      "current_temp": self.current_temp,
+                      "amount_of_tries": self.amount_of_tries,
+                      "best_cost": self.best_cost,
+                      "best_paths": self.best_paths})
 
-                    # Try and improve the wire a thousand times
-                    for _ in range(1000):
-                        # Update algorithm iteration number
-                        iteration += 1
+        return state
 
-                        # Copy the original chip
-                        chip_copy = copy.deepcopy(self.chip)
-
-                        # Copy the current wire
-                        wire_copy = chip_copy.wires[wire]
-
-                        # Randomly replace the wire
-                        random_reassign_wire(wire_copy, chip_copy.grid)
-
-                        # Find a new valid solution
-                        while (wire_copy.get_current_position() !=
-                               wire_copy.father.get_coords()):
-                            random_reassign_wire(wire_copy, chip_copy.grid)
-
-                        # Check for a better solution or accept a worse one
-                        if (self.check_solution_not_perfect(chip_copy)):
-                            # Update chip iteration number
-                            self.chip.iteration = iteration
+    def set_state(self, state: dict[str, Any]) -> None:
+        """
+        Restores a run from the state made by get_state.
+        """
 
-                            # Get time for completed iteration
-                            completed_iteration_time = time.time()
+        super().set_state(state)
+        self.start_temp = state["start_temp"]
+        self.current_temp = state["current_temp"]
+        self.amount_of_tries = state["amount_of_tries"]
+        self.best_cost = state["best_cost"]
+        self.best_paths = state["best_paths"]
 
-                            # Calculate duration of iteration
-                            self.chip.iteration_duration =\
-                                completed_iteration_time - start_time
+    def run_sim_annealing(self, budget: Optional['Budget'] = None,
+                          state: Optional[dict[str, Any]] = None) -> 'Chip':
+        """
+        Runs simulated annealing algorithm until the budget is spent, or
+        until 'ctrl+C' without a budget. Continues from the state of an
+        earlier run if one is given. Worse chips are accepted along the
+        way, so the best chip found is restored at the end.
+        """
 
-                            # Update cumulative iteration duration
-                            self.chip.cumulative_duration +=\
-                                self.chip.iteration_duration
+        if budget is None:
+            budget = Budget()
 
-                            # Reset timer
-                            start_time = time.time()
+        # Building the first solution counts towards the budget too
+        with budget:
+            logger, checkpointer = self.start_run(state)
 
-                            # Save relevant chip data to file
-                            save_to_file(self.chip, self.output_filename)
+            if state is None:
+                self.best_cost = self.chip.cost
+                self.best_paths =\
+                    [list(wire.get_path()) for wire in self.chip.wires]
 
-            except KeyboardInterrupt:
-                break
+            # Start timer
+            start_time: float = time.time()
 
-        print(f"\nRuntime: {round(self.chip.cumulative_duration, 3)} seconds.")
+            try:
+                while not budget.is_spent(self.chip.cost):
+                    if checkpointer is not None and checkpointer.is_due():
+                        self.save_checkpoint(checkpointer, logger)
+
+                    wire_index: int = self.select_wire()
+
+                    # Update algorithm iteration number
+                    self.iteration += 1
+
+                    # Replace the wire in place and get the
+                    # resulting difference in cost
+                    difference: int =\
+                        self.chip.move_wire(wire_index, self.router)
+
+                    # Check for a better solution or accept a worse one
+                    if (self.check_solution_not_perfect(difference)):
+                        # Update chip iteration number
+                        self.chip.iteration = self.iteration
+
+                        # Get time for completed iteration
+                        completed_iteration_time = time.time()
+
+                        # Calculate duration of iteration
+                        self.chip.iteration_duration =\
+                            completed_iteration_time - start_time
+
+                        # Update cumulative iteration duration
+                        self.chip.cumulative_duration +=\
+                            self.chip.iteration_duration
+
+                        # Reset timer
+                        start_time = time.time()
+
+                        # Save relevant chip data to file
+                        logger.log(self.chip)
+
+                        # Remember the cheapest chip configuration
+                        if (self.chip.cost < self.best_cost):
+                            self.best_cost = self.chip.cost
+                            self.best_paths = [list(wire.get_path())
+                                               for wire in self.chip.wires]
+
+                # Keep the final state, before going back to the cheapest
+                # chip, so the run can be continued
+                if checkpointer is not None:
+                    self.save_checkpoint(checkpointer, logger)
+
+                # Go back to the cheapest chip and log it as the final result
+                if (self.best_cost < self.chip.cost):
+                    self.chip.set_wire_paths(self.best_paths)
+                    self.chip.iteration = self.iteration
+                    self.chip.iteration_duration = time.time() - start_time
+                    self.chip.cumulative_duration +=\
+                        self.chip.iteration_duration
+                    logger.log(self.chip)
+            finally:
+                if checkpointer is not None:
+                    checkpointer.close()
+
+                # Write the remaining buffered chip data
+                logger.close()
+
+        print(f"\nStopped: {budget.stop_reason}.")
+        print(f"Runtime: {round(self.chip.cumulative_duration, 3)} seconds.")
         return self.chip
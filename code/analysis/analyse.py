@@ -1,8 +1,10 @@
 import csv
 import matplotlib.pyplot as plt  # type: ignore
 import math
+import os
 import statistics
 import numpy as np
+from analysis.save import get_output_path, load_binary_data
 
 
 def calculate_optimal_bin_width(data: list[int]) -> int:
@@ -29,7 +31,15 @@ def load_data(output_filename: str) ->\
     """
 
     filename: str = output_filename
-    filepath: str = f"./../output/{filename}/{filename}.csv"
+    filepath: str = get_output_path(filename)
+    binary_filepath: str = get_output_path(filename, "binary")
+
+    # Runs logged in the binary format have no csv-file
+    if os.path.exists(binary_filepath):
+        columns = load_binary_data(binary_filepath)
+        return columns[0].tolist(), columns[1].tolist(),\
+            columns[2].tolist(), columns[3].tolist(),\
+            columns[4].tolist(), columns[5].tolist()
 
     # Set up empty data containers
     iterations: list[int] = []
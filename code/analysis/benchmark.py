@@ -0,0 +1,361 @@
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+from algorithms.astar import AstarAlg
+from algorithms.bidirectional import BidirectionalAstar
+from algorithms.hill_climber import HillClimber
+from algorithms.lee import LeeAlg
+from algorithms.pathfinder import PathFinder
+from algorithms.random_alg import create_random_chip, lay_valid_wire
+from algorithms.regions import RegionPartitionedAstar
+from algorithms.simulated_annealing import SimulatedAnnealing
+from analysis.generator import generate_chip
+from classes.chip import Chip
+sys.path.append("../algorithms")
+
+# Fixed budget per algorithm: chips for random, moves for the climbers
+BUDGETS: dict[str, int] = {"random": 10,
+                           "hillclimber": 2000,
+                           "simulatedannealing": 2000}
+
+SORTING_MODES: list[Optional[str]] = [None, "ascending", "descending"]
+HEURISTICS: list[Optional[str]] = [None, "avoid_gates", "avoid_low", "all"]
+ALGORITHMS: list[str] = ["astar", "pathfinder", "lee", "bidirectional",
+                         "regions", "random", "hillclimber",
+                         "simulatedannealing"]
+
+# Routers which run on top of A*, with the sorting modes and heuristics
+ROUTERS: dict[str, type] = {"astar": AstarAlg,
+                            "pathfinder": PathFinder,
+                            "lee": LeeAlg,
+                            "bidirectional": BidirectionalAstar,
+                            "regions": RegionPartitionedAstar}
+
+# Relative change before a metric counts as a regression, timings of
+# cases shorter than the minimum wall time are too noisy to compare
+THRESHOLD: float = 0.10
+MIN_WALL_TIME: float = 0.05
+
+# Synthetic chips for the scaling benchmark, as width, height, gate count
+# and connection count, numbered from SCALING_CHIP on
+SCALES: list[tuple[int, int, int, int]] = [(16, 15, 50, 70),
+                                           (32, 30, 200, 280),
+                                           (64, 60, 800, 1120),
+                                           (128, 120, 3200, 4480)]
+SCALING_CHIP: int = 100
+
+# The random walk of the random router does not finish on large chips, so
+# only the routers on top of A* are scaled by default
+SCALING_ALGORITHMS: list[str] = ["astar", "lee", "bidirectional", "regions"]
+
+
+def run_astar(algorithm: str, chip_no: int, netlist_no: int,
+              setting: dict[str, Any]) -> dict[str, Any]:
+    """
+    Routes a netlist with A* or with one of the routers on top of A*.
+    """
+
+    astar = ROUTERS[algorithm](chip_no, netlist_no, None,
+                               setting["sorting_mode"], setting["heuristic"])
+
+    return {"iterations": len(astar.chip.wires),
+            "nodes_expanded": astar.nodes_expanded,
+            "final_cost": astar.chip.cost}
+
+
+def run_random(chip_no: int, netlist_no: int, budget: int) -> dict[str, Any]:
+    """
+    Creates a fixed number of random chips and keeps the cheapest cost.
+    """
+
+    best_cost: int = min(create_random_chip(chip_no, netlist_no)
+                         .calculate_costs() for _ in range(budget))
+
+    return {"iterations": budget, "nodes_expanded": None,
+            "final_cost": best_cost}
+
+
+def run_climber(algorithm: str, chip_no: int, netlist_no: int,
+                budget: int) -> dict[str, Any]:
+    """
+    Runs a fixed number of hill climber or simulated annealing moves,
+    cycling through the wires.
+    """
+
+    if algorithm == "hillclimber":
+        climber = HillClimber(chip_no, netlist_no, None)
+        check = climber.check_score
+    else:
+        climber = SimulatedAnnealing(chip_no, netlist_no, None, temp=100000)
+        check = climber.check_solution_not_perfect
+
+    climber.make_random_valid_solution()
+    climber.chip.calculate_costs()
+
+    for iteration in range(budget):
+        wire: int = iteration % len(climber.chip.wires)
+        check(climber.chip.move_wire(wire, lay_valid_wire))
+
+    return {"iterations": budget, "nodes_expanded": None,
+            "final_cost": climber.chip.calculate_costs()}
+
+
+def run_case(case: dict[str, Any]) -> dict[str, Any]:
+    """
+    Runs one benchmark case with a fixed seed and returns its measurements.
+    Meant to run in a fresh process, so the peak memory is the case's own.
+    """
+
+    chip_no: int = case.get("chip", (case["netlist"] - 1) // 3)
+    random.seed(a=case["seed"])
+
+    # Silence the progress output of the algorithms
+    start_time: float = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case["algorithm"] in ROUTERS:
+            measurements = run_astar(case["algorithm"], chip_no,
+                                     case["netlist"], case["setting"])
+        elif case["algorithm"] == "random":
+            measurements = run_random(chip_no, case["netlist"],
+                                      case["budget"])
+        else:
+            measurements = run_climber(case["algorithm"], chip_no,
+                                       case["netlist"], case["budget"])
+    wall_time: float = time.perf_counter() - start_time
+
+    result: dict[str, Any] = dict(case)
+    result.update(measurements)
+    result["wall_time"] = wall_time
+    result["iterations_per_second"] =\
+        measurements["iterations"] / max(wall_time, 1e-9)
+    if measurements["nodes_expanded"] is not None:
+        result["expansions_per_second"] =\
+            measurements["nodes_expanded"] / max(wall_time, 1e-9)
+
+    # Peak resident set size in kilobytes (Linux reports kilobytes)
+    result["peak_memory_kb"] =\
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return result
+
+
+def create_cases(algorithms: list[str], netlists: list[int],
+                 seed: int) -> list[dict[str, Any]]:
+    """
+    Creates all benchmark cases for the given algorithms and netlists.
+    """
+
+    cases: list[dict[str, Any]] = []
+
+    for netlist_no in netlists:
+        for algorithm in algorithms:
+            if algorithm in ROUTERS:
+                for sorting_mode in SORTING_MODES:
+                    for heuristic in HEURISTICS:
+                        cases.append({"algorithm": algorithm,
+                                      "netlist": netlist_no,
+                                      "setting": {"sorting_mode": sorting_mode,
+                                                  "heuristic": heuristic},
+                                      "seed": seed, "budget": None})
+            else:
+                cases.append({"algorithm": algorithm, "netlist": netlist_no,
+                              "setting": {}, "seed": seed,
+                              "budget": BUDGETS[algorithm]})
+
+    return cases
+
+
+def get_case_key(result: dict[str, Any]) -> str:
+    """
+    Returns a readable key which identifies a benchmark case.
+    """
+
+    setting: str = ",".join(f"{value}" for value in result["setting"].values())
+    chip: str = f"chip {result['chip']} " if "chip" in result else ""
+
+    return f"{result['algorithm']}[{setting}] {chip}"\
+        f"netlist {result['netlist']}"
+
+
+def run_benchmark(results_filename: str,
+                  algorithms: Optional[list[str]] = None,
+                  netlists: Optional[list[int]] = None,
+                  seed: int = 1) -> list[dict[str, Any]]:
+    """
+    Runs every case in its own process and writes the results to a
+    json-file.
+    """
+
+    cases = create_cases(algorithms or ALGORITHMS,
+                         netlists or list(range(1, 10)), seed)
+    results: list[dict[str, Any]] = []
+
+    # A fresh spawned process per case keeps the peak memory separate
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_case, case).result()
+
+        results.append(result)
+        print(f"{get_case_key(result):<55} {result['wall_time']:>8.2f}s"
+              f"  cost {result['final_cost']}")
+
+    with open(results_filename, "w") as file:
+        json.dump({"python": platform.python_version(),
+                   "platform": platform.platform(),
+                   "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                   "budgets": BUDGETS,
+                   "results": results}, file, indent=1)
+
+    return results
+
+
+def run_scaling(results_filename: str,
+                algorithms: Optional[list[str]] = None,
+                scales: Optional[list[tuple[int, int, int, int]]] = None,
+                seed: int = 1) -> list[dict[str, Any]]:
+    """
+    Runs the algorithms, without sorting or heuristic, on synthetic chips
+    of growing size and reports per step how the wall time grows with the
+    number of connections, as the exponent of a power law.
+    """
+
+    results: list[dict[str, Any]] = []
+    context = multiprocessing.get_context("spawn")
+
+    for algorithm in algorithms or SCALING_ALGORITHMS:
+        previous: Optional[dict[str, Any]] = None
+
+        for index, (width, height, gates, connections) in\
+                enumerate(scales or SCALES):
+            chip_no: int = SCALING_CHIP + index
+            generate_chip(chip_no, 1, width, height, gates, connections, seed)
+            cells: int = Chip(chip_no, "netlist_1.csv").grid.cell_count
+
+            case: dict[str, Any] = {"algorithm": algorithm, "chip": chip_no,
+                                    "netlist": 1, "seed": seed,
+                                    "gates": gates,
+                                    "connections": connections,
+                                    "cells": cells}
+            if algorithm in ROUTERS:
+                case.update({"setting": {"sorting_mode": None,
+                                         "heuristic": None},
+                             "budget": None})
+            else:
+                case.update({"setting": {}, "budget": BUDGETS[algorithm]})
+
+            with ProcessPoolExecutor(max_workers=1,
+                                     mp_context=context) as pool:
+                result = pool.submit(run_case, case).result()
+
+            # Exponent k of wall time ~ connections^k since the last size
+            exponent: str = ""
+            if previous is not None and\
+                    previous["wall_time"] >= MIN_WALL_TIME:
+                result["time_exponent"] =\
+                    math.log(result["wall_time"] / previous["wall_time"]) /\
+                    math.log(connections / previous["connections"])
+                exponent = f"  ~n^{result['time_exponent']:.2f}"
+            previous = result
+
+            results.append(result)
+            print(f"{algorithm:<15} {gates:>6} gates {connections:>7}"
+                  f" connections {result['cells']:>8} cells"
+                  f" {result['wall_time']:>9.2f}s"
+                  f" {result['peak_memory_kb'] // 1024:>6} MB"
+                  f"  cost {result['final_cost']}{exponent}")
+
+    with open(results_filename, "w") as file:
+        json.dump({"python": platform.python_version(),
+                   "platform": platform.platform(),
+                   "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                   "budgets": BUDGETS,
+                   "results": results}, file, indent=1)
+
+    return results
+
+
+def compare_results(baseline_filename: str, new_filename: str,
+                    threshold: float = THRESHOLD) -> list[str]:
+    """
+    Compares two results files and returns a message per regression:
+    a higher wall time or peak memory, fewer iterations per second
+    or a higher final cost.
+    """
+
+    with open(baseline_filename) as file:
+        baseline = {get_case_key(result): result
+                    for result in json.load(file)["results"]}
+    with open(new_filename) as file:
+        new = {get_case_key(result): result
+               for result in json.load(file)["results"]}
+
+    regressions: list[str] = []
+
+    for key, result in new.items():
+        if key not in baseline:
+            continue
+        old = baseline[key]
+
+        # Relative change per metric, positive means worse
+        changes: dict[str, float] = {
+            "peak_memory_kb":
+                result["peak_memory_kb"] / max(old["peak_memory_kb"], 1) - 1}
+        if old["wall_time"] >= MIN_WALL_TIME:
+            changes["wall_time"] = result["wall_time"] / old["wall_time"] - 1
+            changes["iterations_per_second"] =\
+                1 - result["iterations_per_second"] /\
+                max(old["iterations_per_second"], 1e-9)
+
+        for metric, change in changes.items():
+            if change > threshold:
+                regressions.append(f"{key}: {metric}"
+                                   f" {round(100 * change, 1)}% worse"
+                                   f" ({old[metric]:.4g} ->"
+                                   f" {result[metric]:.4g})")
+
+        if result["final_cost"] > old["final_cost"]:
+            regressions.append(f"{key}: final_cost {old['final_cost']} ->"
+                               f" {result['final_cost']}")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    usage: str = "Usage: python3 -m analysis.benchmark run [results.json]"\
+                 " [algorithm,...] [netlist,...]\n"\
+                 "       python3 -m analysis.benchmark scale [results.json]"\
+                 " [algorithm,...] [width:height:gates:connections,...]\n"\
+                 "       python3 -m analysis.benchmark compare"\
+                 " [baseline.json] [new.json] [threshold]"
+
+    if len(sys.argv) >= 3 and sys.argv[1] == "run":
+        algorithms = sys.argv[3].split(",") if len(sys.argv) >= 4 else None
+        netlists = [int(number) for number in sys.argv[4].split(",")]\
+            if len(sys.argv) >= 5 else None
+        run_benchmark(sys.argv[2], algorithms, netlists)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "scale":
+        algorithms = sys.argv[3].split(",") if len(sys.argv) >= 4 else None
+        scales = [tuple(int(number) for number in scale.split(":"))
+                  for scale in sys.argv[4].split(",")]\
+            if len(sys.argv) >= 5 else None
+        run_scaling(sys.argv[2], algorithms, scales)
+    elif len(sys.argv) >= 4 and sys.argv[1] == "compare":
+        threshold = float(sys.argv[4]) if len(sys.argv) >= 5 else THRESHOLD
+        regressions = compare_results(sys.argv[2], sys.argv[3], threshold)
+        for regression in regressions:
+            print(regression)
+        print(f"{len(regressions)} regression(s) found.")
+        sys.exit(1 if regressions else 0)
+    else:
+        print(usage)
+        sys.exit(1)
@@ -0,0 +1,136 @@
+import csv
+import os
+import random
+import sys
+import numpy as np
+from classes.chip import get_chip_folder
+sys.path.append("../classes")
+
+# Most wires per gate: a gate on the bottom layer has five free neighbours
+MAX_WIRES_PER_GATE: int = 5
+
+# Number of nearest gates a gate is connected to, like on the shipped
+# chips most wires are short
+REACH: int = 20
+
+
+def create_gates(width: int, height: int, gate_count: int,
+                 generator: "random.Random") -> list[tuple[int, int]]:
+    """
+    Returns the coordinates of gates on distinct random positions, with x
+    from 1 to width and y from 1 to height.
+    """
+
+    if gate_count > width * height:
+        raise ValueError(f"{gate_count} gates do not fit on a"
+                         f" {width}x{height} print")
+
+    positions: list[int] = generator.sample(range(width * height), gate_count)
+
+    return [(position % width + 1, position // width + 1)
+            for position in positions]
+
+
+def create_connections(gates: list[tuple[int, int]], connection_count: int,
+                       generator: "random.Random",
+                       reach: int = REACH) -> list[tuple[int, int]]:
+    """
+    Returns pairs of gate indices, every pair once and every gate in at most
+    MAX_WIRES_PER_GATE pairs. A gate is connected to one of its nearest
+    gates, or if those are all taken to any other gate.
+    """
+
+    gate_count: int = len(gates)
+    if 2 * connection_count > MAX_WIRES_PER_GATE * gate_count:
+        raise ValueError(f"{connection_count} connections do not fit on"
+                         f" {gate_count} gates")
+
+    # Nearest gates per gate by manhattan distance, one row at a time to
+    # keep the memory linear in the number of gates
+    coords = np.array(gates)
+    reach = min(reach, gate_count - 1)
+    nearest: list[list[int]] = []
+    for index in range(gate_count):
+        distances = np.abs(coords - coords[index]).sum(axis=1)
+        distances[index] = np.iinfo(distances.dtype).max
+        closest = np.argpartition(distances, reach - 1)[:reach]
+        nearest.append(closest.tolist())
+
+    wire_counts: list[int] = [0] * gate_count
+    open_gates: list[int] = list(range(gate_count))
+    pairs: set[tuple[int, int]] = set()
+    connections: list[tuple[int, int]] = []
+
+    while len(connections) < connection_count:
+        mother: int = generator.choice(open_gates)
+        candidates: list[int] = [gate for gate in nearest[mother]
+                                 if wire_counts[gate] < MAX_WIRES_PER_GATE
+                                 and (min(mother, gate), max(mother, gate))
+                                 not in pairs]
+        if not candidates:
+            candidates = [gate for gate in open_gates if gate != mother and
+                          (min(mother, gate), max(mother, gate)) not in pairs]
+        if not candidates:
+            open_gates.remove(mother)
+            if len(open_gates) < 2:
+                raise ValueError(f"Only {len(connections)} connections fit"
+                                 f" on {gate_count} gates")
+            continue
+        father: int = generator.choice(candidates)
+
+        pairs.add((min(mother, father), max(mother, father)))
+        connections.append((mother, father))
+
+        # Full gates are not chosen anymore
+        for gate in (mother, father):
+            wire_counts[gate] += 1
+            if wire_counts[gate] == MAX_WIRES_PER_GATE:
+                open_gates.remove(gate)
+
+    return connections
+
+
+def generate_chip(chip_no: int, netlist_no: int, width: int, height: int,
+                  gate_count: int, connection_count: int,
+                  seed: int = 1) -> None:
+    """
+    Writes a synthetic print and netlist to the data folder of a chip, in
+    the format of the shipped chips. The same seed gives the same chip.
+    """
+
+    generator = random.Random(seed)
+    gates: list[tuple[int, int]] =\
+        create_gates(width, height, gate_count, generator)
+    connections: list[tuple[int, int]] =\
+        create_connections(gates, connection_count, generator)
+
+    folder: str = get_chip_folder(chip_no)
+    os.makedirs(folder, exist_ok=True)
+
+    # Gate ids start at 1, like on the shipped chips
+    with open(os.path.join(folder, f"print_{chip_no}.csv"), "w",
+              newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["chip", "x", "y"])
+        for index, (x, y) in enumerate(gates, 1):
+            writer.writerow([index, x, y])
+
+    with open(os.path.join(folder, f"netlist_{netlist_no}.csv"), "w",
+              newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["chip_a", "chip_b"])
+        for mother, father in connections:
+            writer.writerow([mother + 1, father + 1])
+
+
+if __name__ == "__main__":
+    usage: str = "Usage: python3 -m analysis.generator [chip] [netlist]"\
+                 " [width] [height] [gates] [connections] [seed]"
+
+    if len(sys.argv) < 7:
+        print(usage)
+        sys.exit(1)
+
+    arguments: list[int] = [int(argument) for argument in sys.argv[1:8]]
+    generate_chip(*arguments)
+    print(f"Chip {arguments[0]} written to {get_chip_folder(arguments[0])}")
@@ -1,10 +1,20 @@
+import atexit
 import csv
 import sys
+import time
+import numpy as np
 
-from typing import Union
+from typing import Any, Optional, Union
 from classes.chip import Chip  # type: ignore
 sys.path.append("../classes")
 
+HEADER: list[str] = ["iteration", "cost", "wirecount", "intersectioncount",
+                     "time_per_iteration", "cumulative_time"]
+
+# Column types of the binary format, in header order
+BINARY_COLUMNS: list[Any] = [np.int64, np.int64, np.int64, np.int64,
+                             np.float64, np.float64]
+
 
 def extract_data(chip: 'Chip') -> list[Union[int, float]]:
     """
@@ -24,20 +34,143 @@ def extract_data(chip: 'Chip') -> list[Union[int, float]]:
     return data
 
 
-def save_to_file(chip: 'Chip', output_filename: str) -> None:
+def get_output_path(output_filename: str, log_format: str = "csv") -> str:
+    """
+    Returns the path of the data file of a run.
     """
-    Write data from list to csv-file.
+
+    extension: str = "bin" if log_format == "binary" else "csv"
+
+    return f"../output/{output_filename}/{output_filename}.{extension}"
+
+
+class RunLogger:
+    """
+    Streams chip data to the output folder of a run. The file is opened
+    once, rows are buffered in memory and written when the buffer is full,
+    when flush_interval seconds have passed, or when the logger is closed,
+    which also happens when the program exits.
+
+    The "csv" format is the readable default. The "binary" format writes
+    every flushed block as a row count followed by one contiguous array
+    per column.
+
+    A resumed run passes the size the file had at its checkpoint, rows
+    written after it are dropped and new rows are appended.
     """
 
-    data = extract_data(chip)
+    def __init__(self, output_filename: str, log_format: str = "csv",
+                 buffer_size: int = 1000, flush_interval: float = 5.0,
+                 resume_size: Optional[int] = None) -> None:
+        self.log_format = log_format
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer: list[list[Union[int, float]]] = []
+        self.last_flush: float = time.time()
+
+        path: str = get_output_path(output_filename, log_format)
+        if resume_size is not None:
+            if log_format == "binary":
+                self.file = open(path, "r+b")
+            else:
+                self.file = open(path, "r+", newline="")
+                self.writer = csv.writer(self.file)
+            self.file.seek(resume_size)
+            self.file.truncate()
+        elif log_format == "binary":
+            self.file = open(path, "wb")
+        else:
+            self.file = open(path, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(HEADER)
+
+        atexit.register(self.close)
+
+    def log(self, chip: 'Chip') -> None:
+        """
+        Buffer the data of a chip.
+        """
+
+        self.log_row(extract_data(chip))
+
+    def log_row(self, row: list[Union[int, float]]) -> None:
+        """
+        Buffer a data row as made by extract_data.
+        """
+
+        self.buffer.append(row)
+
+        if len(self.buffer) >= self.buffer_size or\
+                time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write all buffered rows to the file.
+        """
+
+        rows, self.buffer = self.buffer, []
+        self.last_flush = time.time()
+
+        if not rows or self.file.closed:
+            return
+
+        if self.log_format == "binary":
+            self.file.write(np.uint32(len(rows)).tobytes())
+            for index, column_type in enumerate(BINARY_COLUMNS):
+                column = np.array([row[index] for row in rows],
+                                  dtype=column_type)
+                self.file.write(column.tobytes())
+        else:
+            self.writer.writerows(rows)
+
+        self.file.flush()
+
+    def get_size(self) -> int:
+        """
+        Write all buffered rows and return the size of the file.
+        """
+
+        self.flush()
+        return self.file.tell()
+
+    def close(self) -> None:
+        """
+        Flush the remaining rows and close the file.
+        """
+
+        if self.file.closed:
+            return
+
+        self.flush()
+        self.file.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self) -> 'RunLogger':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def load_binary_data(path: str) -> list[Any]:
+    """
+    Loads all columns of a binary data file.
+    """
+
+    blocks: list[list[Any]] = [[] for _ in BINARY_COLUMNS]
+
+    with open(path, "rb") as file:
+        while True:
+            count_bytes: bytes = file.read(4)
+            if len(count_bytes) < 4:
+                break
 
-    # Open output file and append latest chip iteration data
-    with open(f"../output/{output_filename}/{output_filename}.csv",
-              "a", newline="") as file:
-        writer = csv.writer(file)
-        if data[0] == 0:
-            writer.writerow(["iteration", "cost", "wirecount",
-                             "intersectioncount", "time_per_iteration",
-                             "cumulative_time"])
+            count: int = int(np.frombuffer(count_bytes, dtype=np.uint32)[0])
+            for index, column_type in enumerate(BINARY_COLUMNS):
+                size: int = count * np.dtype(column_type).itemsize
+                blocks[index].append(np.frombuffer(file.read(size),
+                                                   dtype=column_type))
 
-        writer.writerow(data)
+    return [np.concatenate(column) if column else np.array([])
+            for column in blocks]
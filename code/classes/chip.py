@@ -1,24 +1,118 @@
-import csv
+import copy
+import os
+from typing import Callable, Optional
+import numpy as np
+from .chip_cache import get_cache_key, load_chip_arrays
+from .conflict_index import ConflictIndex
 from .gate import Gate
 from .wire import Wire
 from .grid import Grid
 
+# Folder with a chip_<number> folder per chip, found from this file so
+# chips load from any working directory
+DATA_FOLDER = os.path.normpath(os.path.join(os.path.dirname(__file__),
+                                            "..", "..", "data"))
+
+# Pristine gates and grid per cache key of the print, netlist and grid
+# size. New chips share the gates and copy the grid, instead of loading
+# the files again
+CHIP_TEMPLATES: dict[bytes, tuple[dict[str, 'Gate'], 'Grid']] = {}
+
+# Cache key per print, netlist and grid size, with the modification times
+# of both files it was hashed at, so unchanged files are not read again
+TEMPLATE_KEYS: dict[tuple[str, str, Optional[tuple[int, int, int]]],
+                    tuple[tuple[int, int], bytes]] = {}
+
+
+def get_chip_folder(chip_no: int) -> str:
+    """
+    Returns the folder with the print and netlists of a chip.
+    """
+
+    return os.path.join(DATA_FOLDER, f"chip_{chip_no}")
+
+
+def get_template_key(print_filename: str, netlist_filename: str,
+                     grid_size: Optional[tuple[int, int, int]]) -> bytes:
+    """
+    Returns the cache key of a print, netlist and grid size, only hashing
+    the files again when they changed since the last call.
+    """
+
+    modified: tuple[int, int] = (os.stat(print_filename).st_mtime_ns,
+                                 os.stat(netlist_filename).st_mtime_ns)
+    paths = (print_filename, netlist_filename, grid_size)
+    if paths not in TEMPLATE_KEYS or TEMPLATE_KEYS[paths][0] != modified:
+        TEMPLATE_KEYS[paths] =\
+            (modified, get_cache_key([print_filename, netlist_filename],
+                                     grid_size))
+
+    return TEMPLATE_KEYS[paths][1]
+
+
+def create_template(chip_no: int, gates: np.ndarray, connections: np.ndarray,
+                    gate_ids: np.ndarray) ->\
+        tuple[dict[str, 'Gate'], 'Grid']:
+    """
+    Returns the gates and an empty grid of a chip, from its gates as rows
+    of id, x and y, its connections as rows of gate ids and its gate id
+    plane. The grid uses the gate id plane as it is, without a copy.
+    """
+
+    chip_gates: dict[str, 'Gate'] = {}
+    for gate_id, x, y in gates.tolist():
+        chip_gates[str(gate_id)] = Gate(gate_id, x, y)
+
+    # Add destination gate to origin gate's destination list
+    for origin_id, destination_id in connections.tolist():
+        chip_gates[str(origin_id)].add_destinations(
+            chip_gates[str(destination_id)])
+
+    # Size the grid to the gate id plane
+    grid_z, grid_y, grid_x = (size - 1 for size in gate_ids.shape)
+
+    return chip_gates, Grid(chip_no, (grid_x, grid_y, grid_z), gate_ids)
+
 
 class Chip:
     """
     Class used to represent a computer chip.
     """
 
-    def __init__(self, chip_no: int, netlist_name: str):
+    def __init__(self, chip_no: int, netlist_name: str,
+                 grid_size: Optional[tuple[int, int, int]] = None):
         self.chip_no = chip_no
         self.netlist_name = netlist_name
-        self.grid = Grid(chip_no)
-        self.gates: dict[str, 'Gate'] = {}
-        self.load_gates(f"./../data/chip_{chip_no}/print_{chip_no}.csv")
-        self.load_connections(f"./../data/chip_{chip_no}/{netlist_name}")
-        self.fill_grid()
+        folder: str = get_chip_folder(chip_no)
+        self.print_filename = os.path.join(folder, f"print_{chip_no}.csv")
+        netlist_filename: str = os.path.join(folder, netlist_name)
+
+        self.template_key: bytes =\
+            get_template_key(self.print_filename, netlist_filename, grid_size)
+        if self.template_key not in CHIP_TEMPLATES:
+            gates, connections, gate_ids =\
+                load_chip_arrays(self.print_filename, netlist_filename,
+                                 self.template_key, grid_size)
+
+            # Copy the gate id plane out of the memory mapped file
+            CHIP_TEMPLATES[self.template_key] =\
+                create_template(chip_no, gates, connections,
+                                gate_ids.astype(np.uint16))
+
+        # Gates never change after loading, so they are shared, and the
+        # grid is copied with empty wire counts
+        self.gates: dict[str, 'Gate']
+        self.gates, grid = CHIP_TEMPLATES[self.template_key]
+        self.grid = copy.deepcopy(grid)
+
         self.wires: list['Wire'] = []
 
+        # Undo journal of moved wires, holding their index and old path
+        self.move_journal: list[tuple[int, list[tuple[int, int, int]]]] = []
+
+        # Index of the wires which share cells, only kept when asked for
+        self.conflict_index: Optional['ConflictIndex'] = None
+
         # Data for later analysis
         self.iteration: int = 0
         self.cost: int = 0
@@ -27,84 +121,193 @@ class Chip:
         self.iteration_duration: float = 0
         self.cumulative_duration: float = 0
 
-    def fill_grid(self) -> None:
+    def add_wire(self, wire: 'Wire') -> None:
         """
-        Load gate id's into 3d numpy array.
+        Add wire to chip.
         """
 
-        for gate in self.gates.values():
-            self.grid.values[gate.get_z(), gate.get_y(), gate.get_x()]\
-                             = gate.get_id()
+        self.wires.append(wire)
 
-    def load_gates(self, filename: str) -> None:
+    def get_connections(self) -> list[tuple['Gate', 'Gate']]:
         """
-        Load all gates from CSV-file into chip.
+        Returns all mother-father connections in netlist order.
         """
 
-        with open(filename) as file:
-            printlist = csv.reader(file)
+        return [(mother, father) for mother in self.gates.values()
+                for father in mother.get_destinations()]
 
-            # Skip the first line
-            next(printlist)
+    def get_wire_paths(self) -> list[list[tuple[int, int, int]]]:
+        """
+        Returns the path of the wire of every connection, in netlist order.
+        """
 
-            # Iterate over the csv file
-            for row in printlist:
+        paths: dict[tuple[int, int], list[list[tuple[int, int, int]]]] = {}
+        for wire in self.wires:
+            paths.setdefault((wire.mother.get_id(), wire.father.get_id()),
+                             []).append(wire.get_path())
 
-                # Create gates
-                new_gate = Gate(int(row[0]), int(row[1]), int(row[2]))
-                self.gates[row[0]] = new_gate
+        return [paths[(mother.get_id(), father.get_id())].pop(0)
+                for mother, father in self.get_connections()]
 
-    def load_connections(self, filename: str) -> None:
+    def add_wire_paths(self, paths: list[list[tuple[int, int, int]]]) -> None:
         """
-        Add destination gate to gate objects on chip.
+        Add a wire with a known path for every connection, in netlist order.
         """
 
-        with open(filename) as file:
-            netlist = csv.reader(file)
+        for (mother, father), path in zip(self.get_connections(), paths):
+            new_wire = Wire(mother, father)
+            self.add_wire(new_wire)
+            self.place_wire(new_wire, list(path))
 
-            # Skip the first line
-            next(netlist)
+    def set_wire_paths(self, paths: list[list[tuple[int, int, int]]]) -> None:
+        """
+        Replaces the path of every wire, in the order of the wires of the
+        chip, and forgets any journaled moves.
+        """
 
-            # Iterate over the csv file
-            for row in netlist:
+        for wire in self.wires:
+            self.lift_wire(wire)
+        for wire, path in zip(self.wires, paths):
+            self.place_wire(wire, list(path))
 
-                # Set origin and destination gates
-                origin_gate = self.gates[row[0]]
-                destination_gate = self.gates[row[1]]
+        self.move_journal.clear()
+        self.calculate_costs()
 
-                # Add destination gate to origin gate's destination list
-                origin_gate.add_destinations(destination_gate)
+    def track_conflicts(self) -> 'ConflictIndex':
+        """
+        Starts keeping an index of the wires which share cells, from the
+        wires laid so far. Wires must not be added afterwards.
+        """
 
-    def add_wire(self, wire: 'Wire') -> None:
+        self.conflict_index = ConflictIndex(self.grid, self.wires)
+        return self.conflict_index
+
+    def lift_wire(self, wire: 'Wire') -> None:
         """
-        Add wire to chip.
+        Removes the units of a wire from the grid, the path stays intact.
         """
 
-        self.wires.append(wire)
+        if self.conflict_index is not None:
+            self.conflict_index.remove_wire(wire)
+
+        gate_coords: tuple[tuple[int, int, int], ...] =\
+            (wire.mother.get_coords(), wire.father.get_coords())
+
+        for coords in wire.get_path():
+            if coords not in gate_coords:
+                self.grid.remove_wire_unit(self.grid.encode(coords))
+
+    def place_wire(self, wire: 'Wire',
+                   path: list[tuple[int, int, int]]) -> None:
+        """
+        Sets the path of a wire and lays its units on the grid.
+        """
+
+        gate_coords: tuple[tuple[int, int, int], ...] =\
+            (wire.mother.get_coords(), wire.father.get_coords())
+        wire.set_path(path)
+
+        for coords in path:
+            if coords not in gate_coords:
+                self.grid.add_wire_unit(self.grid.encode(coords))
+
+        if self.conflict_index is not None:
+            self.conflict_index.add_wire(wire)
+
+    def move_wire(self, wire_index: int,
+                  route: Callable[['Wire', 'Grid'], None]) -> int:
+        """
+        Rips up a wire and reroutes it in place with the given router.
+        Returns the cost difference, the move is kept in the undo journal
+        until it is committed or undone.
+        """
+
+        wire: 'Wire' = self.wires[wire_index]
+        old_cost: int = self.calculate_costs()
+
+        # Journal the old path, then rip up and reroute the wire
+        self.move_journal.append((wire_index, wire.get_path()))
+        self.lift_wire(wire)
+        wire.reset_path()
+        route(wire, self.grid)
+        if self.conflict_index is not None:
+            self.conflict_index.add_wire(wire)
+
+        return self.calculate_costs() - old_cost
+
+    def commit_move(self) -> None:
+        """
+        Keeps all journaled moves.
+        """
+
+        self.move_journal.clear()
 
-    def calculate_costs(self) -> int:
+    def undo_move(self) -> None:
         """
-        Calculate total cost of chip configuration.
+        Restores the old paths of all journaled moves, latest first.
         """
-        
+
+        while self.move_journal:
+            wire_index, old_path = self.move_journal.pop()
+            wire: 'Wire' = self.wires[wire_index]
+            self.lift_wire(wire)
+            self.place_wire(wire, old_path)
+
+        self.calculate_costs()
+
+    def calculate_costs(self, full_scan: bool = False) -> int:
+        """
+        Calculate total cost of chip configuration from the running totals
+        of the grid, or by scanning every cell if full_scan is set.
+        """
+
+        if full_scan:
+            return self.scan_costs()
+
+        # Add 1 per wire, because in the grid,
+        # a wire on top of a father gate is not represented
+        self.wirecount = self.grid.wire_units + len(self.wires)
+        self.intersectioncount = self.grid.intersection_units
+        self.cost = self.wirecount + 300 * self.intersectioncount
+
+        return self.cost
+
+    def verify_costs(self) -> bool:
+        """
+        Checks if the running cost totals agree with a full grid scan.
+        """
+
+        incremental_cost: int = self.calculate_costs()
+        incremental_counts: tuple[int, int] =\
+            (self.wirecount, self.intersectioncount)
+        scanned_cost: int = self.calculate_costs(full_scan=True)
+
+        return incremental_cost == scanned_cost and\
+            incremental_counts == (self.wirecount, self.intersectioncount)
+
+    def scan_costs(self) -> int:
+        """
+        Calculate total cost of chip configuration by scanning the grid.
+        """
+
         cost = 0
         self.wirecount = 0
         self.intersectioncount = 0
 
         # Loop through grid
-        for layer in self.grid.values:
+        for layer in self.grid.wire_counts:
             for row in layer:
-                for value in row:
-                    if value < -1:
-                        intersections = abs(value) - 1
+                for count in row:
+                    if count > 1:
+                        intersections = int(count) - 1
                         self.intersectioncount += intersections
                     else:
                         intersections = 0
 
                     # Add every wire and intersection to the total count
-                    if value < 0:
-                        self.wirecount += abs(value)
-                        cost += (abs(value) + (300 * intersections))
+                    if count > 0:
+                        self.wirecount += int(count)
+                        cost += (int(count) + (300 * intersections))
 
         # Add 1 per wire, because in the grid,
         # a wire on top of a father gate is not represented
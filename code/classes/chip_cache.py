@@ -0,0 +1,185 @@
+import csv
+import hashlib
+import os
+from typing import Optional
+import numpy as np
+
+# Highest layer of every chip, the gates lie on layer 0
+LAYERS = 7
+
+# Marks a chip cache file, and its layout version
+CACHE_MAGIC = 0x43484950
+CACHE_VERSION = 2
+
+# Header words: magic, version, 5 key words, gate count, connection
+# count and the x, y and z size of the grid
+HEADER_SIZE = 12
+
+
+def get_cache_key(filenames: list[str],
+                  grid_size: Optional[tuple[int, int, int]]) -> bytes:
+    """
+    Returns a key which changes with the content of the files and the
+    requested grid size.
+    """
+
+    digest = hashlib.sha1(repr(grid_size).encode())
+    for filename in filenames:
+        with open(filename, "rb") as file:
+            digest.update(file.read())
+
+    return digest.digest()
+
+
+def read_print(filename: str) -> np.ndarray:
+    """
+    Returns the id, x and y of every gate in a print file.
+    """
+
+    with open(filename) as file:
+        rows = [row for row in list(csv.reader(file))[1:] if row]
+
+    return np.array(rows, dtype=np.int32).reshape(-1, 3)
+
+
+def read_netlist(filename: str) -> np.ndarray:
+    """
+    Returns the mother and father gate id of every connection in a
+    netlist file.
+    """
+
+    with open(filename) as file:
+        rows = [row for row in list(csv.reader(file))[1:] if row]
+
+    return np.array(rows, dtype=np.int32).reshape(-1, 2)
+
+
+def get_print_size(gates: np.ndarray) -> tuple[int, int, int]:
+    """
+    Returns the grid size which fits all gates, with a free row and
+    column beyond the outermost gates.
+    """
+
+    return (int(gates[:, 1].max()) + 1, int(gates[:, 2].max()) + 1, LAYERS)
+
+
+def create_gate_ids(gates: np.ndarray,
+                    grid_size: tuple[int, int, int]) -> np.ndarray:
+    """
+    Returns the gate id plane of a grid, with the id of every gate on its
+    cell and 0 elsewhere.
+    """
+
+    grid_x, grid_y, grid_z = grid_size
+    gate_ids = np.zeros((grid_z + 1, grid_y + 1, grid_x + 1), dtype=np.uint16)
+    gate_ids[0, gates[:, 2], gates[:, 1]] = gates[:, 0]
+
+    return gate_ids
+
+
+def pack_chip_arrays(key: bytes, gates: np.ndarray, connections: np.ndarray,
+                     gate_ids: np.ndarray) -> np.ndarray:
+    """
+    Returns the key, gates, connections and gate id plane as one flat
+    array, with a header holding the key and the sizes. The gate id plane
+    keeps its 16 bit cells, two to a word.
+    """
+
+    grid_z, grid_y, grid_x = (size - 1 for size in gate_ids.shape)
+    plane = gate_ids.reshape(-1).astype(np.uint16)
+    if len(plane) % 2:
+        plane = np.append(plane, np.uint16(0))
+    header = np.array([CACHE_MAGIC, CACHE_VERSION,
+                       *np.frombuffer(key, dtype=np.int32),
+                       len(gates), len(connections), grid_x, grid_y, grid_z],
+                      dtype=np.int32)
+
+    return np.concatenate([header, gates.reshape(-1),
+                           connections.reshape(-1),
+                           plane.view(np.int32)])
+
+
+def unpack_chip_arrays(content: np.ndarray) ->\
+        Optional[tuple[bytes, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Returns the key, gates, connections and gate id plane of a flat array
+    made by pack_chip_arrays, as views on it, or None if it is not one.
+    """
+
+    header: list[int] = content[:HEADER_SIZE].tolist()
+    if len(header) < HEADER_SIZE or\
+            header[:2] != [CACHE_MAGIC, CACHE_VERSION]:
+        return None
+
+    key: bytes = np.array(header[2:7], dtype=np.int32).tobytes()
+    gate_count, connection_count, grid_x, grid_y, grid_z = header[7:]
+    shape: tuple[int, int, int] = (grid_z + 1, grid_y + 1, grid_x + 1)
+    start: int = HEADER_SIZE
+    gates = content[start:start + 3 * gate_count].reshape(-1, 3)
+    start += 3 * gate_count
+    connections = content[start:start + 2 * connection_count].reshape(-1, 2)
+    start += 2 * connection_count
+    cell_count: int = shape[0] * shape[1] * shape[2]
+    gate_ids = content[start:start + (cell_count + 1) // 2]\
+        .view(np.uint16)[:cell_count].reshape(shape)
+
+    return key, gates, connections, gate_ids
+
+
+def write_chip_cache(filename: str, key: bytes, gates: np.ndarray,
+                     connections: np.ndarray, gate_ids: np.ndarray) -> None:
+    """
+    Writes the gates, connections and gate id plane to one flat array
+    file, which can be memory mapped.
+    """
+
+    content = pack_chip_arrays(key, gates, connections, gate_ids)
+
+    # Write to a temporary file first, so the cache is never partial
+    temporary_filename: str = f"{filename}.{os.getpid()}.tmp.npy"
+    np.save(temporary_filename, content)
+    os.replace(temporary_filename, filename)
+
+
+def read_chip_cache(filename: str, key: bytes) ->\
+        Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Returns the gates, connections and gate id plane from a memory mapped
+    cache file, or None if there is no cache file for this key.
+    """
+
+    if not os.path.exists(filename):
+        return None
+
+    try:
+        arrays = unpack_chip_arrays(np.load(filename, mmap_mode="r"))
+    except ValueError:
+        return None
+
+    if arrays is None or arrays[0] != key:
+        return None
+
+    return arrays[1:]
+
+
+def load_chip_arrays(print_filename: str, netlist_filename: str, key: bytes,
+                     grid_size: Optional[tuple[int, int, int]] = None) ->\
+        tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the gates, connections and gate id plane of a chip from the
+    cache file next to the netlist, or else parsed from the csv files and
+    cached. The grid is sized to the print, unless a size is given.
+    """
+
+    cache_filename: str = f"{os.path.splitext(netlist_filename)[0]}.chip.npy"
+
+    arrays = read_chip_cache(cache_filename, key)
+    if arrays is None:
+        gates: np.ndarray = read_print(print_filename)
+        connections: np.ndarray = read_netlist(netlist_filename)
+        gate_ids: np.ndarray =\
+            create_gate_ids(gates, grid_size or get_print_size(gates))
+        write_chip_cache(cache_filename, key, gates, connections, gate_ids)
+        arrays = gates, connections, gate_ids
+
+    return arrays
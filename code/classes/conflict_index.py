@@ -0,0 +1,95 @@
+from .grid import Grid
+from .wire import Wire
+
+
+class ConflictIndex:
+    """ Keeps track of which wires share cells with other wires. For every
+        occupied cell it holds the indices of the wires on it, and for every
+        wire the number of its cells which hold two or more wires, each of
+        which adds an intersection to the cost of the chip. The index
+        follows the wires as they are lifted and placed, so a move only
+        updates the cells of the moved wire and the wires it shares them
+        with.
+    """
+
+    def __init__(self, grid: 'Grid', wires: list['Wire']) -> None:
+        self.grid = grid
+        self.wire_indices: dict['Wire', int] =\
+            {wire: index for index, wire in enumerate(wires)}
+        self.occupants: dict[int, list[int]] = {}
+        self.shared_cells: list[int] = [0] * len(wires)
+
+        for wire in wires:
+            self.add_wire(wire)
+
+    def get_wire_cells(self, wire: 'Wire') -> list[int]:
+        """
+        Returns the cells of a wire, without its own gates, which are not
+        counted on the grid either.
+        """
+
+        gate_coords: tuple[tuple[int, int, int], ...] =\
+            (wire.mother.get_coords(), wire.father.get_coords())
+        stride_y: int = self.grid.stride_y
+        stride_z: int = self.grid.stride_z
+
+        # Grid.encode inlined, this runs for every cell of every move
+        return [x + y * stride_y + z * stride_z
+                for x, y, z in wire.get_path()
+                if (x, y, z) not in gate_coords]
+
+    def add_wire(self, wire: 'Wire') -> None:
+        """
+        Adds the cells of a wire which was just placed.
+        """
+
+        index: int = self.wire_indices[wire]
+        shared_cells: list[int] = self.shared_cells
+
+        for cell in self.get_wire_cells(wire):
+            occupants: list[int] = self.occupants.setdefault(cell, [])
+            if occupants:
+                shared_cells[index] += 1
+
+                # The wire already on the cell shares it from now on
+                if len(occupants) == 1:
+                    shared_cells[occupants[0]] += 1
+            occupants.append(index)
+
+    def remove_wire(self, wire: 'Wire') -> None:
+        """
+        Removes the cells of a wire which is about to be lifted.
+        """
+
+        index: int = self.wire_indices[wire]
+        shared_cells: list[int] = self.shared_cells
+
+        for cell in self.get_wire_cells(wire):
+            occupants: list[int] = self.occupants[cell]
+            occupants.remove(index)
+            if not occupants:
+                del self.occupants[cell]
+                continue
+
+            shared_cells[index] -= 1
+
+            # The wire left on the cell no longer shares it
+            if len(occupants) == 1:
+                shared_cells[occupants[0]] -= 1
+
+    def get_shared_cells(self, wire_index: int) -> int:
+        """
+        Returns the number of cells a wire shares with other wires.
+        """
+
+        return self.shared_cells[wire_index]
+
+    def get_conflicting_wires(self) -> list[int]:
+        """
+        Returns the indices of the wires which share at least one cell,
+        most shared cells first.
+        """
+
+        return sorted((index for index, count in enumerate(self.shared_cells)
+                       if count > 0),
+                      key=lambda index: -self.shared_cells[index])
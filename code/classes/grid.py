@@ -1,6 +1,6 @@
 from .gate import Gate
 import numpy as np
-from typing import Any
+from typing import Any, Optional
 
 
 class Grid:
@@ -8,23 +8,76 @@ class Grid:
     Class used to create a grid for storing wire and gate locations in 3D space.
     """
 
-    def __init__(self, chip_no: int) -> None:
+    def __init__(self, chip_no: int, size: tuple[int, int, int],
+                 gate_ids: Optional[np.ndarray] = None) -> None:
         self.chip_no = chip_no
 
-        if self.chip_no == 0:
-            self.grid_x = 7
-            self.grid_y = 6
-            self.grid_z = 7
-        elif self.chip_no == 1:
-            self.grid_x = 17
-            self.grid_y = 12
-            self.grid_z = 7
-        elif self.chip_no == 2:
-            self.grid_x = 17
-            self.grid_y = 16
-            self.grid_z = 7
-
-        self.values = self.initialize_grid()
+        # Highest x, y and z coordinate of the grid
+        self.grid_x, self.grid_y, self.grid_z = size
+
+        self.shape: tuple[int, int, int] =\
+            (self.grid_z + 1, self.grid_y + 1, self.grid_x + 1)
+
+        # Static gate id per cell (0 if no gate) and the number of wires
+        # on every cell, as separate small integer planes. A given gate id
+        # plane is used as it is, so it can live in shared memory
+        self.gate_ids = gate_ids if gate_ids is not None\
+            else np.zeros(self.shape, dtype=np.uint16)
+        self.wire_counts = self.initialize_grid()
+
+        # Running totals of laid wire units and intersections
+        self.wire_units: int = 0
+        self.intersection_units: int = 0
+
+        # Flat cell-index mode: views on the same data, indexed by cell
+        self.flat_gate_ids = self.gate_ids.reshape(-1)
+        self.flat_wire_counts = self.wire_counts.reshape(-1)
+        self.stride_y: int = self.grid_x + 1
+        self.stride_z: int = (self.grid_x + 1) * (self.grid_y + 1)
+        self.cell_count: int = self.stride_z * (self.grid_z + 1)
+        self.cell_coords: list[tuple[int, int, int]] =\
+            [(x, y, z) for z in range(self.grid_z + 1)
+             for y in range(self.grid_y + 1)
+             for x in range(self.grid_x + 1)]
+        self.neighbours: list[tuple[int, ...]] = self.create_neighbour_table()
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> 'Grid':
+        """
+        Copies the wire counts, but shares the static gate ids and lookup
+        tables.
+        """
+
+        # Set the attributes one by one rather than with copy.copy, which
+        # fills the instance dict at once and makes attribute access slower
+        grid: 'Grid' = Grid.__new__(Grid)
+        for name, value in vars(self).items():
+            setattr(grid, name, value)
+        memo[id(self)] = grid
+        grid.wire_counts = self.wire_counts.copy()
+        grid.flat_wire_counts = grid.wire_counts.reshape(-1)
+
+        return grid
+
+    def __getstate__(self) -> dict[str, Any]:
+        """
+        Leaves out the flat views, which would be pickled or copied as
+        arrays of their own and no longer share their data with the planes.
+        """
+
+        state: dict[str, Any] = dict(vars(self))
+        del state["flat_gate_ids"], state["flat_wire_counts"]
+
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """
+        Restores a grid and makes the flat views on its own planes.
+        """
+
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.flat_gate_ids = self.gate_ids.reshape(-1)
+        self.flat_wire_counts = self.wire_counts.reshape(-1)
 
     def get_grid_size(self) -> tuple[int, int, int]:
         """
@@ -35,23 +88,127 @@ class Grid:
 
     def initialize_grid(self) -> Any:
         """
-        Create grid in 3d array.
+        Create the wire count plane in 3d array.
         """
 
         # Creates grid with zeros with aspect ratio self.x, self.y
-        grid = np.zeros((self.grid_z + 1, self.grid_y + 1, self.grid_x + 1))
+        grid = np.zeros(self.shape, dtype=np.uint16)
 
         return grid
 
-    def check_for_illegal_gate(self, position: tuple[int, int, int],
-                               father: 'Gate') -> bool:
+    def encode(self, position: tuple[int, int, int]) -> int:
+        """
+        Returns the cell index of a (x, y, z) position.
+        """
+
+        return position[0] + position[1] * self.stride_y +\
+            position[2] * self.stride_z
+
+    def decode(self, cell: int) -> tuple[int, int, int]:
+        """
+        Returns the (x, y, z) position of a cell index.
+        """
+
+        return self.cell_coords[cell]
+
+    def create_neighbour_table(self) -> list[tuple[int, ...]]:
+        """
+        Create a table with the neighbouring cells of every cell, in the
+        order +x, -x, +y, -y, +z, -z, without moves outside the grid.
+        """
+
+        neighbours: list[tuple[int, ...]] = []
+
+        for x, y, z in self.cell_coords:
+            cell: int = self.encode((x, y, z))
+            cell_neighbours: list[int] = []
+
+            if x < self.grid_x:
+                cell_neighbours.append(cell + 1)
+            if x > 0:
+                cell_neighbours.append(cell - 1)
+            if y < self.grid_y:
+                cell_neighbours.append(cell + self.stride_y)
+            if y > 0:
+                cell_neighbours.append(cell - self.stride_y)
+            if z < self.grid_z:
+                cell_neighbours.append(cell + self.stride_z)
+            if z > 0:
+                cell_neighbours.append(cell - self.stride_z)
+
+            neighbours.append(tuple(cell_neighbours))
+
+        return neighbours
+
+    def set_gate(self, position: tuple[int, int, int], gate_id: int) -> None:
+        """
+        Places a gate on the gate id plane.
+        """
+
+        self.gate_ids[position[2], position[1], position[0]] = gate_id
+
+    def get_gate_id(self, cell: int) -> int:
+        """
+        Returns the id of the gate on a cell, or 0 if there is none.
+        """
+
+        return self.flat_gate_ids.item(cell)
+
+    def is_gate(self, cell: int) -> bool:
+        """
+        Checks if a cell holds a gate.
+        """
+
+        return self.flat_gate_ids.item(cell) > 0
+
+    def get_wire_count(self, cell: int) -> int:
+        """
+        Returns the number of wires on a cell.
+        """
+
+        return self.flat_wire_counts.item(cell)
+
+    def get_occupancy_mask(self) -> Any:
+        """
+        Returns a bit-packed mask of the cells which hold a wire, in cell
+        order, eight cells per byte.
+        """
+
+        return np.packbits(self.flat_wire_counts > 0)
+
+    def add_wire_unit(self, cell: int) -> None:
+        """
+        Lays a wire unit on a cell and updates the running totals.
+        """
+
+        count = self.flat_wire_counts.item(cell)
+        self.wire_units += 1
+        if count >= 1:
+            self.intersection_units += 1
+
+        self.flat_wire_counts[cell] = count + 1
+
+    def remove_wire_unit(self, cell: int) -> None:
+        """
+        Removes a wire unit from a cell and updates the running totals.
+        """
+
+        count = self.flat_wire_counts.item(cell)
+        self.wire_units -= 1
+        if count >= 2:
+            self.intersection_units -= 1
+
+        self.flat_wire_counts[cell] = count - 1
+
+    def check_for_illegal_gate(self, cell: int, father: 'Gate') -> bool:
         """
         Checks for a foreign, illegal gate.
         """
-        
-        if self.values[position[2]][position[1]][position[0]] == father.get_id():
+
+        gate_id = self.flat_gate_ids.item(cell)
+        if gate_id == father.get_id():
             return False
-        elif self.values[position[2]][position[1]][position[0]] > 0:
+        elif gate_id > 0:
             return True
 
         return False
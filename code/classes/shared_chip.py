@@ -0,0 +1,78 @@
+from multiprocessing import shared_memory
+from typing import Any
+import numpy as np
+from .chip import CHIP_TEMPLATES, Chip, create_template
+from .chip_cache import pack_chip_arrays, unpack_chip_arrays
+
+# Shared memory blocks attached by this process, kept open for as long as
+# the templates on them are in use
+ATTACHED_BLOCKS: dict[str, "shared_memory.SharedMemory"] = {}
+
+
+class SharedChip:
+    """ Publishes the static state of a chip, its gates, connections and
+        gate id plane, in one block of shared memory. Worker processes
+        attach to it by name with attach_shared_chip, without copying, so
+        a new chip in a worker only allocates its own wire counts. Use it
+        as a context manager in the coordinating process, the block is
+        removed on exit.
+    """
+
+    def __init__(self, chip: "Chip") -> None:
+        gates = np.array([(gate.get_id(), gate.get_x(), gate.get_y())
+                          for gate in chip.gates.values()], dtype=np.int32)
+        connections = np.array([(mother.get_id(), father.get_id())
+                                for mother, father in chip.get_connections()],
+                               dtype=np.int32).reshape(-1, 2)
+        content: np.ndarray = pack_chip_arrays(chip.template_key, gates,
+                                               connections,
+                                               chip.grid.gate_ids)
+
+        self.memory = shared_memory.SharedMemory(create=True,
+                                                 size=content.nbytes)
+        np.ndarray(content.shape, dtype=content.dtype,
+                   buffer=self.memory.buf)[:] = content
+        self.name: str = self.memory.name
+
+    def __enter__(self) -> "SharedChip":
+        return self
+
+    def __exit__(self, *exception: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Removes the shared memory block. Workers which attached to it keep
+        their mapping.
+        """
+
+        self.memory.close()
+        self.memory.unlink()
+
+
+def attach_shared_chip(chip_no: int, name: str) -> None:
+    """
+    Attaches to a chip published by SharedChip and makes it the template
+    for new chips with the same print, netlist and grid size in this
+    process. The gate id plane stays in shared memory. The neighbour table
+    of the grid holds Python objects, which can not be shared, so a spawned
+    process still builds its own.
+    """
+
+    if name in ATTACHED_BLOCKS:
+        return
+
+    # Child processes share the resource tracker of the coordinating
+    # process, which removes the block when the SharedChip is closed
+    memory = shared_memory.SharedMemory(name=name)
+    ATTACHED_BLOCKS[name] = memory
+
+    content = np.ndarray((memory.size // 4,), dtype=np.int32,
+                         buffer=memory.buf)
+    key, gates, connections, gate_ids = unpack_chip_arrays(content)
+
+    # A forked process already shares the template of its parent, lookup
+    # tables included, so it only needs one if it was spawned
+    if key not in CHIP_TEMPLATES:
+        CHIP_TEMPLATES[key] = create_template(chip_no, gates, connections,
+                                              gate_ids)
@@ -11,15 +11,27 @@ class Wire:
         self.father = father
         self.start_position: tuple[int, int, int] = mother.get_coords()
         self.path: list[tuple[int, int, int]] = [self.start_position]
+        self.visited: set[tuple[int, int, int]] = {self.start_position}
 
     def add_unit(self, position: tuple[int, int, int]) -> None:
         self.path.append(position)
+        self.visited.add(position)
 
     def pop_unit(self) -> tuple[int, int, int]:
-        return self.path.pop()
+        position = self.path.pop()
+        self.visited.discard(position)
+        return position
 
     def reset_path(self) -> None:
         self.path = [self.start_position]
+        self.visited = {self.start_position}
+
+    def set_path(self, path: list[tuple[int, int, int]]) -> None:
+        self.path = path
+        self.visited = set(path)
+
+    def has_visited(self, position: tuple[int, int, int]) -> bool:
+        return position in self.visited
 
     def get_path(self) -> list[tuple[int, int, int]]:
         return self.path
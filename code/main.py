@@ -1,9 +1,21 @@
 from visualisation.visualiser import visualise
-from algorithms.random_alg import run_random
+from algorithms.random_alg import run_random, run_random_parallel
 from algorithms.hill_climber import HillClimber
 from algorithms.simulated_annealing import SimulatedAnnealing as sa
+from algorithms.parallel_tempering import ParallelTempering
 from algorithms.astar import AstarAlg
+from algorithms.pathfinder import PathFinder
+from algorithms.lee import LeeAlg, lay_lee_wire
+from algorithms.bidirectional import BidirectionalAstar
+from algorithms.portfolio import Portfolio
+from algorithms.ordering_search import OrderingSearch
+from algorithms.regions import RegionPartitionedAstar
+from algorithms.random_alg import lay_valid_wire
+from algorithms.budget import Budget
+from algorithms.checkpoint import CHECKPOINT_INTERVAL, get_checkpoint_path,\
+    read_checkpoint
 from analysis.analyse import create_histogram, create_lineplot
+from classes.chip import get_chip_folder
 import sys
 import os
 sys.path.append("algorithms")
@@ -13,6 +25,101 @@ sys.path.append("analysis")
 
 
 if __name__ == "__main__":
+    # Optional flag to log run data in the compact binary format
+    log_format: str = "csv"
+    if "--binary" in sys.argv:
+        sys.argv.remove("--binary")
+        log_format = "binary"
+
+    # Optional flag to let the climbers reroute wires with the Lee router
+    router = lay_valid_wire
+    if "--lee" in sys.argv:
+        sys.argv.remove("--lee")
+        router = lay_lee_wire
+
+    # Optional flag to let the climbers pick the wires to move at random,
+    # weighted by their intersections, instead of in turn
+    move_selection: str = "cycle"
+    if "--congestion" in sys.argv:
+        sys.argv.remove("--congestion")
+        move_selection = "congestion"
+
+    # Optional budget for the random algorithm and the climbers, which
+    # otherwise run until 'ctrl+C'
+    budget_options: dict = {}
+    for flag, option, convert in [("--time=", "time_limit", float),
+                                  ("--iterations=", "iterations", int),
+                                  ("--patience=", "no_improvement", int),
+                                  ("--target=", "target_cost", int)]:
+        for argument in sys.argv[1:]:
+            if argument.startswith(flag):
+                sys.argv.remove(argument)
+                try:
+                    value = convert(argument[len(flag):])
+                except ValueError:
+                    value = None
+                if value is None or not value >= 0:
+                    print(f"Invalid value for {flag[:-1]}."
+                          f" Choose a number of at least 0.")
+                    sys.exit(1)
+                budget_options[option] = value
+                break
+    budget = Budget(**budget_options)
+
+    # Optional seconds between checkpoints of the climbers
+    checkpoint_interval: float = CHECKPOINT_INTERVAL
+    for argument in sys.argv[1:]:
+        if argument.startswith("--checkpoint="):
+            sys.argv.remove(argument)
+            try:
+                value = float(argument[len("--checkpoint="):])
+            except ValueError:
+                value = None
+            if value is None or not value >= 0:
+                print("Invalid value for --checkpoint."
+                      " Choose a number of at least 0.")
+                sys.exit(1)
+            checkpoint_interval = value
+            break
+
+    # Continue a hillclimber or simulated annealing run from its last
+    # checkpoint, with the settings it was started with
+    if len(sys.argv) == 3 and sys.argv[1] == "resume":
+        output_filename = sys.argv[2]
+        checkpoint_filename = get_checkpoint_path(output_filename)
+        if not os.path.exists(checkpoint_filename):
+            print("No checkpoint found for this output filename.")
+            sys.exit(1)
+
+        state = read_checkpoint(checkpoint_filename)
+        climber_router = lay_lee_wire if state["router"] == "lay_lee_wire"\
+            else lay_valid_wire
+        print(f"Resumed {state['algorithm']} at iteration"
+              f" {state['iteration']}\nPress 'ctrl+C' to end run")
+
+        if (state["algorithm"] == "simulatedannealing"):
+            sim_annealing = sa(state["chip_no"], state["netlist_no"],
+                               output_filename, temp=state["start_temp"],
+                               log_format=state["log_format"],
+                               router=climber_router,
+                               checkpoint_interval=checkpoint_interval,
+                               move_selection=state["move_selection"])
+            chip = sim_annealing.run_sim_annealing(budget, state)
+            visualise(chip, state["algorithm"], output_filename)
+            create_lineplot(output_filename, "Simulated Annealing")
+        else:
+            hillclimber = HillClimber(state["chip_no"], state["netlist_no"],
+                                      output_filename, state["log_format"],
+                                      climber_router, checkpoint_interval,
+                                      state["move_selection"])
+            chip = hillclimber.run(budget, state)
+            visualise(chip, state["algorithm"], output_filename)
+            create_lineplot(output_filename, "Hillclimber")
+
+        print(f"Run completed. Output can be found in:"
+              f" Chips-and-Circuits-Project/output/{output_filename}/")
+        sys.exit(0)
+
     # Check if at least three command-line arguments are provided
     if len(sys.argv) >= 5:
         chip_number: int = int(sys.argv[1])
@@ -37,18 +144,54 @@ if __name__ == "__main__":
                " chip number, netlist number, algorithm, output filename.")
         sys.exit(1)
 
-    if chip_number not in [0, 1, 2]:
+    # Any chip with a data folder is allowed, shipped or generated
+    chip_folder = get_chip_folder(chip_number)
+    if not os.path.exists(os.path.join(chip_folder,
+                                       f"print_{chip_number}.csv")):
         print("Chip number not valid.")
         sys.exit(1)
 
-    # Create list for allowed netlists
-    allowed_netlist_numbers = range(chip_number * 3 + 1, chip_number * 3 + 4)
-
-    # Check if specified netlist falls within list
-    if netlist_number not in allowed_netlist_numbers:
+    # Check if the chip has the specified netlist
+    if not os.path.exists(os.path.join(chip_folder,
+                                       f"netlist_{netlist_number}.csv")):
         print("Netlist number not valid.")
         sys.exit(1)
 
+    # Optional numbers of the parallel algorithms, read before the output
+    # folder is made, so invalid input leaves no empty folder behind
+    if (algorithm == "randomparallel"):
+        # Optional worker count and total number of iterations
+        workers = int(sys.argv[5]) if len(sys.argv) >= 6 else None
+        iterations = int(sys.argv[6]) if len(sys.argv) >= 7 else 1000
+        if workers is not None and workers < 1:
+            print("Invalid number of workers. Choose at least 1.")
+            sys.exit(1)
+        if iterations < 1:
+            print("Invalid number of iterations. Choose at least 1.")
+            sys.exit(1)
+    elif (algorithm == "paralleltempering"):
+        # Optional replica count and number of exchange rounds
+        replicas = int(sys.argv[5]) if len(sys.argv) >= 6 else None
+        rounds = int(sys.argv[6]) if len(sys.argv) >= 7 else None
+        if replicas is not None and replicas < 1:
+            print("Invalid number of replicas. Choose at least 1.")
+            sys.exit(1)
+    elif (algorithm == "portfolio"):
+        # Optional wall-clock budget and number of random connection orders
+        try:
+            time_budget = float(sys.argv[5]) if len(sys.argv) >= 6 else 60
+            permutations = int(sys.argv[6]) if len(sys.argv) >= 7 else 24
+        except ValueError:
+            print("Invalid portfolio options. Give the time budget in"
+                  " seconds and the number of orderings as numbers.")
+            sys.exit(1)
+        if not time_budget > 0:
+            print("Invalid time budget. Choose more than 0 seconds.")
+            sys.exit(1)
+        if permutations < 0:
+            print("Invalid number of orderings. Choose at least 0.")
+            sys.exit(1)
+
     # Create output folder
     folder = f"../output/{output_filename}"
 
@@ -58,13 +201,24 @@ if __name__ == "__main__":
         print("Please specify a unique output filename.")
         sys.exit(1)
 
+    # Algorithms which take a sorting mode and heuristic, and lay all
+    # wires when they are created
+    routers: dict[str, type] = {"astar": AstarAlg,
+                                "pathfinder": PathFinder,
+                                "lee": LeeAlg,
+                                "bidirectional": BidirectionalAstar,
+                                "orderingsearch": OrderingSearch,
+                                "regions": RegionPartitionedAstar}
+
     # Check if valid sorting mode is given
-    if (sorting_mode not in [None, "ascending", "descending"]):
+    if (algorithm in routers and
+            sorting_mode not in [None, "ascending", "descending"]):
         print("Invalid heuristic. Choose from: ascending, descending")
         sys.exit(1)
 
     # Check if valid heuristic is given
-    if (heuristic not in [None, "avoid_gates", "avoid_low", "all"]):
+    if (algorithm in routers and
+            heuristic not in [None, "avoid_gates", "avoid_low", "all"]):
         print("Invalid heuristic. Choose from: avoid_gates, avoid_low, all")
         sys.exit(1)
 
@@ -72,7 +226,22 @@ if __name__ == "__main__":
         print("Started Random\nPress 'ctrl+C' to end run")
 
         # Run random algorithm
-        chip = run_random(chip_number, netlist_number, output_filename)
+        chip = run_random(chip_number, netlist_number, output_filename,
+                          log_format, budget)
+        if chip is None:
+            print("No chip was made within the budget.")
+            sys.exit(1)
+        visualise(chip, algorithm, output_filename)
+        create_histogram(output_filename)
+
+        print(endmessage)
+    elif (algorithm == "randomparallel"):
+        print("Started parallel Random")
+
+        # Run random algorithm over multiple processes
+        chip = run_random_parallel(chip_number, netlist_number,
+                                   output_filename, workers, iterations,
+                                   log_format=log_format)
         visualise(chip, algorithm, output_filename)
         create_histogram(output_filename)
 
@@ -81,8 +250,10 @@ if __name__ == "__main__":
         print("Started Hill Climber\nPress 'ctrl+C' to end run")
 
         # Run Hill Climber algorithm
-        hillclimber = HillClimber(chip_number, netlist_number, output_filename)
-        chip = hillclimber.run()
+        hillclimber = HillClimber(chip_number, netlist_number, output_filename,
+                                  log_format, router, checkpoint_interval,
+                                  move_selection)
+        chip = hillclimber.run(budget)
         visualise(chip, algorithm, output_filename)
         create_lineplot(output_filename, "Hillclimber")
 
@@ -92,25 +263,60 @@ if __name__ == "__main__":
 
         # Run Simulated Annealing algorithm
         sim_annealing = sa(chip_number, netlist_number, output_filename,
-                           temp=100000)
-        chip = sim_annealing.run_sim_annealing()
+                           temp=100000, log_format=log_format,
+                           router=router,
+                           checkpoint_interval=checkpoint_interval,
+                           move_selection=move_selection)
+        chip = sim_annealing.run_sim_annealing(budget)
         visualise(chip, algorithm, output_filename)
         create_lineplot(output_filename, "Simulated Annealing")
 
         print(endmessage)
-    elif (algorithm == "astar"):
-        print("Started A*")
-
-        # Run A* algorithm
-        astar = AstarAlg(chip_number, netlist_number, output_filename,
-                         sorting_mode, heuristic)
-        chip = astar.chip
-        algorithm_name = f"{algorithm} - Sort: {sorting_mode}"\
-                          f" - Heuristic: {heuristic}"
+    elif (algorithm == "paralleltempering"):
+        print("Started Parallel Tempering\nPress 'ctrl+C' to end run")
+
+        # Run simulated annealing replicas over multiple processes
+        tempering = ParallelTempering(chip_number, netlist_number,
+                                      output_filename, replicas,
+                                      log_format=log_format)
+        chip = tempering.run(rounds)
+        if chip is None:
+            sys.exit(1)
+        visualise(chip, algorithm, output_filename)
+        create_lineplot(output_filename, "Parallel Tempering")
+
+        print(endmessage)
+    elif (algorithm == "portfolio"):
+        print("Started Portfolio")
+
+        # Race router configurations over multiple processes
+        portfolio = Portfolio(chip_number, netlist_number, output_filename,
+                              time_budget=time_budget,
+                              permutations=permutations,
+                              log_format=log_format)
+        chip = portfolio.run()
+        if chip is None:
+            sys.exit(1)
+        visualise(chip, algorithm, output_filename)
+
+        print(endmessage)
+    elif (algorithm in routers):
+        print(f"Started {algorithm}")
+
+        # Run the router, which lays all wires on creation
+        router_alg = routers[algorithm](chip_number, netlist_number,
+                                        output_filename, sorting_mode,
+                                        heuristic, log_format=log_format)
+        chip = router_alg.chip
+        algorithm_name = (f"{algorithm} - Sort: {sorting_mode}"
+                          f" - Heuristic: {heuristic}")
         visualise(chip, algorithm_name, output_filename)
 
         print(endmessage)
     else:
         print("Invalid algorithm:"\
-               " Choose from random, hillclimber, simulatedannealing or astar.")
+               " Choose from random, randomparallel, hillclimber,"\
+               " simulatedannealing, paralleltempering, portfolio, astar,"\
+               " pathfinder, lee, bidirectional, orderingsearch"\
+               " or regions.")
         sys.exit(1)
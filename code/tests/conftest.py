@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import the packages of the code folder, as main.py does when run from it
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,55 @@
+import random
+from typing import Callable
+import pytest
+from algorithms.lee import lay_lee_wire
+from algorithms.random_alg import create_random_chip, lay_valid_wire
+from classes.chip import Chip
+from classes.grid import Grid
+from classes.wire import Wire
+
+# Routers which Chip.move_wire can reroute a wire with
+ROUTERS: list[Callable[[Wire, Grid], None]] = [lay_valid_wire, lay_lee_wire]
+
+
+@pytest.mark.parametrize("router", ROUTERS)
+def test_running_costs_match_full_scan(router: Callable[[Wire, Grid], None])\
+        -> None:
+    """
+    The running cost totals agree with a full grid scan after every move,
+    undo and commit.
+    """
+
+    random.seed(1)
+    chip: Chip = create_random_chip(0, 1)
+    assert chip.verify_costs()
+
+    for step in range(60):
+        chip.move_wire(random.randrange(len(chip.wires)), router)
+        assert chip.verify_costs()
+
+        # Keep some moves stacked in the journal before ending them
+        if step % 3 == 0:
+            chip.undo_move()
+        elif step % 3 == 1:
+            chip.commit_move()
+        assert chip.verify_costs()
+
+    chip.undo_move()
+    assert chip.verify_costs()
+
+
+def test_undo_restores_cost() -> None:
+    """
+    Undoing journaled moves restores the cost from before the moves.
+    """
+
+    random.seed(2)
+    chip: Chip = create_random_chip(0, 1)
+    cost: int = chip.calculate_costs()
+
+    for wire_index in range(len(chip.wires)):
+        chip.move_wire(wire_index, lay_lee_wire)
+    chip.undo_move()
+
+    assert chip.calculate_costs() == cost
+    assert chip.verify_costs()